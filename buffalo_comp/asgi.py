@@ -3,6 +3,12 @@ ASGI config for buffalo_comp project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Live leaderboard streams (/leaderboard/stream, Server-Sent Events) need this app,
+and are only offered with LIVE_STREAM=1 in the environment:
+    LIVE_STREAM=1 gunicorn buffalo_comp.asgi:application -k uvicorn.workers.UvicornWorker
+One async worker holds thousands of open streams; the in-process broadcaster in
+core.live only reaches clients connected to the same worker process.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -71,6 +71,16 @@ DATABASES = {
     )
 }
 
+# --- Cache (shared by every worker: holds rendered pages + data-generation counters) ---
+# REDIS_URL in prod; locally a file-based cache stands in so all workers still agree.
+if os.environ.get("REDIS_URL"):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+                          "LOCATION": os.environ["REDIS_URL"]}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                          "LOCATION": os.environ.get("CACHE_DIR", str(BASE_DIR / ".cache")),
+                          "OPTIONS": {"MAX_ENTRIES": 5000}}}
+
 # --- Auth redirects ---
 LOGIN_URL = "/login"
 LOGIN_REDIRECT_URL = "/me"
@@ -89,14 +99,40 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 # Django 5 STORAGES
 STORAGES = {
     "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
-    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},  # overridden by Cloudinary if set
+    # content-addressed: identical uploads share one file (core.storage); overridden by Cloudinary if set
+    "default": {"BACKEND": "core.storage.ContentAddressedStorage"},
 }
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Who sends media bytes (core.media): "django" (FileResponse with ETag/Range), or offload to
+# the front server with "x-accel" (nginx: `location /protected-media/ { internal; alias <MEDIA_ROOT>/; }`)
+# or "x-sendfile" (Apache/lighttpd mod_xsendfile)
+MEDIA_SERVE = os.environ.get("MEDIA_SERVE", "django")
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", "/protected-media/")
+MEDIA_MAX_AGE = 60 * 60   # non-content-addressed media (legacy paths) revalidate hourly
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# 1 = scores saved by judges (staff page, batch endpoint) wait as 'pending' until a head
+# judge approves their heat in /staff/moderacion; 0 = they count as soon as they're saved
+SCORE_MODERATION = os.environ.get("SCORE_MODERATION", "0") == "1"
+
+# Days a batch idempotency key (core.models.ScoreSubmission) is remembered: a judge's device
+# retries within seconds or minutes; older keys are pruned as new batches come in
+SCORE_SUBMISSION_RETENTION_DAYS = int(os.environ.get("SCORE_SUBMISSION_RETENTION_DAYS", "7"))
+
+# 1 = served by the ASGI app (buffalo_comp.asgi on uvicorn workers): leaderboards also open
+# a Server-Sent Events stream (/leaderboard/stream) and update within a second of a score.
+# Keep 0 under WSGI: each open stream would hold a sync worker for good; pages then only
+# poll /leaderboard/rows every 15 s
+LIVE_STREAM = os.environ.get("LIVE_STREAM", "0") == "1"
+
+# How core.ranking ranks a division when standings are refreshed: "python", "numpy"
+# (columnar; needs numpy, pays off with hundreds of athletes per division) or "sql"
+# (RANK() window in the database over the stored Score.rank_* keys). Same places either way
+RANKING_BACKEND = os.environ.get("RANKING_BACKEND", "python")
+
 # --- HTTPS & proxy ---
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 if DEBUG:
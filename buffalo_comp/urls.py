@@ -1,12 +1,14 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.contrib.auth import views as auth_views
+from core import media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('core.urls')),
     path('login', auth_views.LoginView.as_view(template_name='auth/login.html'), name='login'),
     path('logout', auth_views.LogoutView.as_view(), name='logout'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # media in DEBUG and production alike; MEDIA_SERVE=x-accel hands the bytes to nginx (core.media)
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), media.serve, name='media'),
+]
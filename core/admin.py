@@ -1,4 +1,6 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
 from django.utils.safestring import mark_safe
 from .models import (
     Division, Athlete, Event, Heat, LaneAssignment,
@@ -25,7 +27,7 @@ class LaneInline(admin.TabularInline):
 
 @admin.register(Heat)
 class HeatAdmin(admin.ModelAdmin):
-    list_display = ('event','division','number','start_time','lane_count')
+    list_display = ('event','division','number','start_time','end_time','lane_count')
     list_filter = ('event','division')
     inlines = [LaneInline]
 
@@ -60,13 +62,54 @@ class EventDivisionSpecAdmin(admin.ModelAdmin):
             return mark_safe(f'<img src="{obj.poster.url}" style="max-width:100%;border:1px solid #e5e7eb;border-radius:.5rem;" />')
         return "—"
 
+SCORE_CONFLICT = ('Otro usuario modificó este score mientras lo editabas. '
+                  'Recargá la página para ver los valores actuales.')
+
+class ScoreAdminForm(forms.ModelForm):
+    class Meta:
+        model = Score
+        fields = '__all__'
+        widgets = {'version': forms.HiddenInput}
+
+    def clean(self):
+        cleaned = super().clean()
+        version = cleaned.get('version')
+        # early check, no write: ScoreAdmin.save_model does the compare-and-swap once the
+        # whole form is valid, so an invalid POST leaves the row's version alone
+        if self.instance.pk and version is not None:
+            if not Score.objects.filter(pk=self.instance.pk, version=version).exists():
+                raise forms.ValidationError(SCORE_CONFLICT)
+        return cleaned
+
+class ScoreConflict(Exception):
+    """The row moved between clean() and save_model(): abort the admin's transaction."""
+
 @admin.register(Score)
 class ScoreAdmin(admin.ModelAdmin):
+    form = ScoreAdminForm
     # IMPORTANT: use fields that exist on the new Score model
     list_display = ('part','athlete','finished','time_seconds','reps','weight','tiebreak_seconds','status','created_at')
     list_filter = ('part','status','athlete__division')
     search_fields = ('athlete__first_name','athlete__last_name','athlete__bib')
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            # compare-and-swap inside the admin's transaction: the save only happens if nobody
+            # (judges' page, batch endpoint, another admin) wrote the row since it was loaded
+            version = form.cleaned_data['version']
+            if not Score.objects.filter(pk=obj.pk, version=version).update(version=version + 1):
+                raise ScoreConflict
+            obj.version = version + 1
+        super().save_model(request, obj, form, change)
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except ScoreConflict:
+            # raised inside the atomic block, so nothing of this POST was written
+            self.message_user(request, SCORE_CONFLICT, messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
 @admin.register(Announcement)
 class AnnouncementAdmin(admin.ModelAdmin):
     list_display = ('title','is_pinned','created_at')
@@ -0,0 +1,103 @@
+"""
+Versioned render cache. Every page is keyed on the "data generation" of the scopes it
+reads; model signals bump those counters (core.signals), so a cached render is reused
+until something it depends on actually changes. Counters live in the shared CACHES
+backend, so a bump from one gunicorn worker is seen by all of them.
+"""
+import hashlib
+import time
+from functools import wraps
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+RESULTS = 'results'     # scores → standings
+SCHEDULE = 'schedule'   # heats, lanes, caps
+EVENTS = 'events'       # events, parts, division specs
+ROSTER = 'roster'       # athletes
+CONTENT = 'content'     # announcements, sponsors, venue
+ALL_SCOPES = (RESULTS, SCHEDULE, EVENTS, ROSTER, CONTENT)
+
+PAGE_TIMEOUT = 60 * 60 * 6
+
+def _gen_key(scope: str) -> str:
+    return f"gen:{scope}"
+
+def generation(*scopes: str) -> tuple:
+    """Current counters for the given scopes (missing ones are seeded)."""
+    keys = [_gen_key(s) for s in scopes]
+    found = cache.get_many(keys)
+    missing = {k: time.time_ns() for k in keys if k not in found}
+    if missing:
+        # seeded from the clock so an evicted counter never repeats an old value
+        for k, v in missing.items():
+            cache.add(k, v, timeout=None)
+        found.update(cache.get_many(list(missing)))
+    return tuple(found.get(k, 0) for k in keys)
+
+def bump(*scopes: str) -> None:
+    """Invalidate every cached render that depends on any of the scopes."""
+    for s in scopes:
+        try:
+            cache.incr(_gen_key(s))
+        except ValueError:
+            cache.set(_gen_key(s), time.time_ns(), timeout=None)
+
+def page_key(name: str, scopes, params) -> str:
+    raw = repr((name, generation(*scopes), params))
+    return "render:" + hashlib.sha1(raw.encode()).hexdigest()
+
+def cached_page(*scopes: str, params=(), timeout=PAGE_TIMEOUT, public=False):
+    """
+    Cache anonymous GET renders of a view per (params values, generation of scopes).
+    Only the listed query params take part in the key; logged-in users (staff links,
+    CSRF token in the header) always get a fresh render, unless public=True says the
+    response doesn't depend on the user at all (JSON API).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or (request.user.is_authenticated and not public):
+                return view(request, *args, **kwargs)
+            values = tuple(request.GET.get(p, '') for p in params) + tuple(sorted(kwargs.items()))
+            key = page_key(view.__name__, scopes, values)
+            hit = cache.get(key)
+            if hit is not None:
+                content_type, content = hit
+                return HttpResponse(content, content_type=content_type)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, (response['Content-Type'], response.content), timeout)
+            return response
+        return wrapper
+    return decorator
+
+def conditional_page(*scopes: str, params=(), last_modified=None, public=False):
+    """
+    Strong ETag + Last-Modified for pages that only change with data. The ETag comes from
+    the generation counters (no DB) and the view's last_modified(request) lookup, so
+    If-None-Match is answered with 304 before the view, its ranking or template run.
+    Cache-Control: no-cache makes browsers revalidate instead of guessing freshness.
+    """
+    def changed(request, *args, **kwargs):
+        if not hasattr(request, '_data_last_modified'):
+            request._data_last_modified = last_modified(request) if last_modified else None
+        return request._data_last_modified
+
+    def etag(request, *args, **kwargs):
+        lm = changed(request)
+        raw = repr((tuple(request.GET.get(p, '') for p in params), sorted(kwargs.items()),
+                    None if public else request.user.pk, generation(*scopes), lm.timestamp() if lm else None))
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def decorator(view):
+        conditional = condition(etag_func=etag, last_modified_func=changed)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
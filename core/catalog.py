@@ -0,0 +1,68 @@
+"""
+In-process copy of the competition's reference data: divisions, events, parts and division
+specs. A handful of rows that change a few times per competition, read by nearly every
+view. get() loads them in four queries and keeps them until the EVENTS generation moves
+(Division/Event bump every scope, EventPart/EventDivisionSpec bump EVENTS; core.signals),
+so each worker reloads on its next request after a change anywhere. core.signals also
+drops this process's copy on commit. The objects are shared between requests: read only.
+"""
+from typing import List, Optional
+from django.db import transaction
+from .models import Division, Event, EventPart, EventDivisionSpec
+from . import caching
+
+class Catalog:
+    def __init__(self):
+        self.divisions: List[Division] = list(Division.objects.all())
+        self.events: List[Event] = list(Event.objects.all())
+        events = {e.pk: e for e in self.events}
+        divisions = {d.pk: d for d in self.divisions}
+        self.parts: List[EventPart] = sorted(EventPart.objects.all(), key=lambda p: (events[p.event_id].number, p.order))
+        parts = {p.pk: p for p in self.parts}
+        for p in self.parts:
+            p.event = events[p.event_id]
+        self._parts_by_event = {e.pk: [] for e in self.events}
+        for p in self.parts:
+            self._parts_by_event[p.event_id].append(p)
+        self._specs = {}
+        for s in EventDivisionSpec.objects.all():
+            s.part, s.division = parts[s.part_id], divisions[s.division_id]
+            self._specs[(s.part_id, s.division_id)] = s
+        self._division = {(d.sex, d.category): d for d in self.divisions}
+        self._event = {e.number: e for e in self.events}
+        self._part = {(p.event.number, p.slug): p for p in self.parts}
+
+    def division(self, sex: str, category: str) -> Optional[Division]:
+        return self._division.get((sex, category))
+
+    def event(self, number: Optional[int]) -> Optional[Event]:
+        return self._event.get(number)
+
+    def parts_for(self, event: Event) -> List[EventPart]:
+        """Parts of one event in display order."""
+        return self._parts_by_event.get(event.pk, [])
+
+    def part(self, event_number: int, slug: str) -> Optional[EventPart]:
+        return self._part.get((event_number, slug))
+
+    def spec(self, part: EventPart, division: Division) -> Optional[EventDivisionSpec]:
+        return self._specs.get((part.pk, division.pk))
+
+    def specs_for(self, event: Event, division: Division) -> List[EventDivisionSpec]:
+        return [self._specs[(p.pk, division.pk)] for p in self.parts_for(event) if (p.pk, division.pk) in self._specs]
+
+_current = None   # (EVENTS generation, Catalog)
+
+def get() -> Catalog:
+    global _current
+    gen = caching.generation(caching.EVENTS)   # read before loading: a bump mid-load reloads next time
+    if _current is None or _current[0] != gen:
+        _current = (gen, Catalog())
+    return _current[1]
+
+def invalidate() -> None:
+    """Drop this process's copy once the writing transaction commits."""
+    def drop():
+        global _current
+        _current = None
+    transaction.on_commit(drop)
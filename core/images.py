@@ -0,0 +1,135 @@
+"""
+Resized WebP/JPEG derivatives plus a tiny blurred placeholder (LQIP) for uploaded images.
+They live in MEDIA_ROOT/derived/<key>/ as <width>.webp, <width>.jpg and meta.json,
+keyed by the source content (the cas/ digest, core.storage), so they're immutable too.
+generate() is idempotent; schedule() runs it on a small thread pool after commit,
+never inside the request, then bumps the cached pages that embed the image. Templates use the srcset/lqip filters (core.templatetags).
+"""
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Optional
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageFilter, ImageOps
+from .storage import DERIVED_PREFIX, is_blob
+from . import caching
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (160, 320, 640, 960, 1280)   # content column is 640px; 2x screens need up to 1280
+FORMATS = {
+    'webp': ('WEBP', {'quality': 78, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+LQIP_WIDTH = 24
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='images')
+_manifests = {}   # key → meta.json contents; a key's derivatives never change once written
+
+def derived_key(name: str) -> Optional[str]:
+    """
+    Folder of a source file's derivatives: its digest for cas/ blobs, else a hash of
+    name + size + mtime (legacy paths can be overwritten). None when the storage has
+    no local files (Cloudinary does its own transforms).
+    """
+    if not name:
+        return None
+    if is_blob(name):
+        return PurePosixPath(name).stem
+    try:
+        st = os.stat(default_storage.path(name))
+    except (NotImplementedError, OSError):
+        return None
+    return hashlib.sha1(f"{name}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()
+
+def _folder(key: str) -> Path:
+    return Path(settings.MEDIA_ROOT) / DERIVED_PREFIX / key
+
+def _write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def _encode(im: Image.Image, fmt: str, **opts) -> bytes:
+    if fmt == 'JPEG' and im.mode != 'RGB':
+        flat = Image.new('RGB', im.size, 'white')   # no alpha in JPEG: flatten on white
+        flat.paste(im, mask=im.getchannel('A') if 'A' in im.getbands() else None)
+        im = flat
+    buf = io.BytesIO()
+    im.save(buf, fmt, **opts)
+    return buf.getvalue()
+
+def generate(name: str, force: bool = False) -> Optional[str]:
+    """Write every derivative of one source file; returns its key (None if not applicable)."""
+    key = derived_key(name)
+    if key is None:
+        return None
+    meta_path = _folder(key) / 'meta.json'
+    if meta_path.exists() and not force:
+        return key
+
+    with default_storage.open(name) as f:
+        im = ImageOps.exif_transpose(Image.open(f))
+        im.load()
+    im = im.convert('RGBA' if 'A' in im.getbands() or 'transparency' in im.info else 'RGB')
+
+    widths = sorted({w for w in WIDTHS if w < im.width} | {min(im.width, WIDTHS[-1])})
+    for w in widths:
+        small = im.resize((w, max(1, round(im.height * w / im.width))), Image.LANCZOS)
+        for ext, (fmt, opts) in FORMATS.items():
+            _write(_folder(key) / f"{w}.{ext}", _encode(small, fmt, **opts))
+
+    tiny = im.resize((LQIP_WIDTH, max(1, round(im.height * LQIP_WIDTH / im.width)))).filter(ImageFilter.GaussianBlur(1))
+    meta = {'w': widths, 'width': im.width, 'height': im.height,
+            'lqip': 'data:image/webp;base64,' + base64.b64encode(_encode(tiny, 'WEBP', quality=30)).decode()}
+    _write(meta_path, json.dumps(meta).encode())   # written last: its presence means complete
+    return key
+
+def _generate_logged(name: str, scopes) -> None:
+    try:
+        fresh = manifest(name) is None
+        generate(name)
+    except Exception:
+        logger.exception("image derivatives failed for %s", name)
+        return
+    if fresh and scopes:
+        # pages rendered since the upload's own bump were cached without a srcset
+        caching.bump(*scopes)
+
+def schedule(name: str, scopes=()) -> None:
+    """Generate derivatives in the background once the current transaction commits;
+    `scopes` (core.caching) are bumped when new ones were written."""
+    if name:
+        transaction.on_commit(lambda: _executor.submit(_generate_logged, name, scopes))
+
+def manifest(name: str) -> Optional[dict]:
+    key = derived_key(name)
+    if key is None:
+        return None
+    meta = _manifests.get(key)
+    if meta is None:
+        try:
+            meta = json.loads((_folder(key) / 'meta.json').read_bytes())
+        except (OSError, ValueError):
+            return None   # not generated (yet): callers fall back to the original
+        _manifests[key] = meta = {**meta, 'key': key}
+    return meta
+
+def srcset(name: str, ext: str = 'webp') -> str:
+    meta = manifest(name)
+    if not meta or ext not in FORMATS:
+        return ''
+    base = f"{settings.MEDIA_URL}{DERIVED_PREFIX}/{meta['key']}"
+    return ', '.join(f"{base}/{w}.{ext} {w}w" for w in meta['w'])
+
+def lqip(name: str) -> str:
+    meta = manifest(name)
+    return meta['lqip'] if meta else ''
@@ -0,0 +1,103 @@
+"""
+Live leaderboard pushes. An in-process broadcaster stands in for an external pub/sub:
+publishers (score saves, from any thread) and SSE subscribers (coroutines on the ASGI
+event loop) must share the process, so live updates need the ASGI app (uvicorn).
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from typing import Optional
+from .standings import Changes, Diff
+
+QUEUE_SIZE = 64
+HEARTBEAT_SECONDS = 15
+
+class Broadcaster:
+    def __init__(self):
+        self._subs = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel) -> asyncio.Queue:
+        queue = asyncio.Queue(QUEUE_SIZE)
+        with self._lock:
+            self._subs[channel].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, channel, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = self._subs.get(channel, set())
+            subs.difference_update({s for s in subs if s[1] is queue})
+            if not subs:
+                self._subs.pop(channel, None)
+
+    def publish(self, channel, message: dict) -> None:
+        """Thread-safe: hands the message to each subscriber's own event loop."""
+        with self._lock:
+            subs = list(self._subs.get(channel, ()))
+        for loop, queue in subs:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, message)
+            except RuntimeError:  # loop already closed
+                pass
+
+    def channels(self) -> list:
+        with self._lock:
+            return list(self._subs)
+
+def _offer(queue: asyncio.Queue, message: dict) -> None:
+    # a client this far behind can't apply diffs anymore: tell it to reload
+    if queue.full():
+        while not queue.empty():
+            queue.get_nowait()
+        message = {'reset': 1}
+    queue.put_nowait(message)
+
+broadcaster = Broadcaster()
+
+def channel(division_id: int, part_id: Optional[int] = None):
+    return ('standings', division_id, part_id)
+
+def _encode(diff: Diff, extra=None) -> dict:
+    rows = []
+    for aid, (place, points, display) in diff.changed.items():
+        row = {'a': aid, 'pl': place, 'pt': points}
+        if display:
+            row['d'] = display
+        if extra:
+            row.update(extra(aid))
+        rows.append(row)
+    return {'rows': rows, 'rm': diff.removed}
+
+def publish_changes(changes: Optional[Changes]) -> None:
+    """Push compact row diffs of one standings refresh to the part and overall channels."""
+    if changes is None:
+        return
+    if changes.part:
+        broadcaster.publish(channel(changes.division_id, changes.part_id), _encode(changes.part))
+    if changes.overall:
+        def part_cell(aid):
+            row = changes.part_rows.get(aid)
+            return {'p': {changes.part_id: row[:2]}} if row else {}
+        broadcaster.publish(channel(changes.division_id), _encode(changes.overall, part_cell))
+
+def publish_reset(division_id: int) -> None:
+    """A whole division was re-ranked: every open table of it reloads."""
+    for ch in broadcaster.channels():
+        if ch[1] == division_id:
+            broadcaster.publish(ch, {'reset': 1})
+
+async def stream(ch):
+    """SSE body: retry hint, then one 'rows' event per change, heartbeat comments in between."""
+    queue = broadcaster.subscribe(ch)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: rows\ndata: {json.dumps(message, separators=(',', ':'))}\n\n"
+    finally:
+        broadcaster.unsubscribe(ch, queue)
@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db.models import ImageField
+
+from core import caching, images
+from core.signals import MEDIA_MODELS
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG derivatives and placeholders for every uploaded image (idempotent)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate even if derivatives exist')
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **opts):
+        names = set()
+        for model in MEDIA_MODELS:
+            for field in model._meta.fields:
+                if isinstance(field, ImageField):
+                    names.update(n for n in model.objects.exclude(**{field.attname: ''})
+                                 .values_list(field.attname, flat=True))
+
+        t0 = time.perf_counter()
+        done = failed = skipped = 0
+
+        def build(name):
+            try:
+                return name, images.generate(name, force=opts['force']), None
+            except Exception as e:
+                return name, None, e
+
+        with ThreadPoolExecutor(max_workers=opts['workers']) as pool:
+            for name, key, error in pool.map(build, sorted(names)):
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"  {name}: {error}"))
+                elif key is None:
+                    skipped += 1
+                else:
+                    done += 1
+        if done:   # pages cached before their derivatives existed have no srcset
+            caching.bump(*{scope for scopes in MEDIA_MODELS.values() for scope in scopes})
+        self.stdout.write(self.style.SUCCESS(
+            f"{done} images ready, {skipped} not applicable, {failed} failed in {time.perf_counter() - t0:.1f}s"))
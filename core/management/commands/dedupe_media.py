@@ -0,0 +1,62 @@
+import os
+from collections import Counter
+from pathlib import Path
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import caching
+from core.models import MediaBlob
+from core.media import ENCODED_PREFIX
+from core.storage import DERIVED_PREFIX, ContentAddressedStorage, blob_fields, is_blob
+
+class Command(BaseCommand):
+    help = ("Move media referenced by model file fields into content-addressed storage, "
+            "recount MediaBlob references and report (or --prune) files nothing points at.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true', help='Delete unreferenced files instead of listing them')
+
+    def handle(self, *args, **opts):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError("STORAGES['default'] is not core.storage.ContentAddressedStorage")
+
+        moved = 0
+        refs = Counter()
+        with transaction.atomic():
+            for model in apps.get_app_config('core').get_models():
+                for field in blob_fields(model):
+                    for pk, name in model.objects.exclude(**{field: ''}).values_list('pk', field):
+                        if not is_blob(name):
+                            if not default_storage.exists(name):
+                                self.stdout.write(self.style.WARNING(f"  missing: {name} ({model.__name__} {pk})"))
+                                continue
+                            with default_storage.open(name) as f:
+                                name = default_storage.save(name, f)
+                            # update(): no signals, the counts are rebuilt below
+                            model.objects.filter(pk=pk).update(**{field: name})
+                            moved += 1
+                        refs[name] += 1
+
+            MediaBlob.objects.all().delete()
+            MediaBlob.objects.bulk_create([MediaBlob(name=n, refs=c, size=default_storage.size(n))
+                                           for n, c in refs.items()], batch_size=500)
+            transaction.on_commit(lambda: caching.bump(*caching.ALL_SCOPES))   # media URLs changed
+
+        root = Path(default_storage.location)
+        generated = (DERIVED_PREFIX + '/', ENCODED_PREFIX + '/')   # rebuilt from the blobs, not uploads
+        orphans = [p for p in root.rglob('*')
+                   if p.is_file() and p.relative_to(root).as_posix() not in refs
+                   and not p.relative_to(root).as_posix().startswith(generated)]
+        size = sum(p.stat().st_size for p in orphans)
+        for p in orphans:
+            if opts['prune']:
+                os.remove(p)
+            else:
+                self.stdout.write(f"  unreferenced: {p.relative_to(root).as_posix()}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{moved} files moved into cas/, {len(refs)} blobs for {sum(refs.values())} references"))
+        verb = "Deleted" if opts['prune'] else "Unreferenced (run with --prune to delete)"
+        self.stdout.write(self.style.SUCCESS(f"{verb}: {len(orphans)} files, {size / 1e6:.1f} MB"))
@@ -0,0 +1,214 @@
+import filecmp
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html import unescape
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlencode, urljoin, urlsplit
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+
+from core import catalog
+
+# URL attributes in our templates; srcset holds several "url width" candidates
+URL_ATTR_RE = re.compile(r'\s(href|src|srcset|hx-get|data-stream)="([^"]*)"')
+# live-update endpoints: a static copy is a snapshot, its poll/SSE hooks are dropped
+LIVE_PATHS = ('/leaderboard/rows', '/leaderboard/stream')
+
+def _param(params: dict, name: str, default=''):
+    return params.get(name, [default])[0]
+
+def _number(params: dict, name: str, default: int = 1) -> int:
+    v = _param(params, name)
+    return int(v) if v.isdigit() else default
+
+def page_dir(path: str, params: dict) -> Optional[str]:
+    """
+    Output directory ('' for /, else ending in '/') of a public URL, resolving omitted
+    parameters the way the views do, so every spelling of a page maps to one file;
+    None for URLs the export doesn't cover (staff, API, login…).
+    """
+    ref = catalog.get()
+    if path == '/':
+        return ''
+    if path in ('/sponsors', '/info-lugar'):
+        return path[1:] + '/'
+    if path == '/horario':
+        event = ref.event(_number(params, 'event'))
+        return f"horario/{event.number}/" if event else None
+    division = ref.division(_param(params, 'sexo', 'F'), _param(params, 'cat', 'sx'))
+    if division is None:
+        return None
+    dv = f"{division.sex}-{division.category}"
+    if path == '/atletas':
+        return f"atletas/{dv}/"
+    if path == '/leaderboard':
+        if _param(params, 'scope') != 'part' or not _param(params, 'event').isdigit():
+            return f"leaderboard/{dv}/"
+        event = ref.event(_number(params, 'event'))
+        parts = ref.parts_for(event) if event else []
+        part = next((p for p in parts if p.slug == _param(params, 'part')), None) or (parts[0] if parts else None)
+        return f"leaderboard/{dv}/e{event.number}{part.slug}/" if part else None
+    if path == '/eventos':
+        event = ref.event(_number(params, 'event'))
+        if event is None:
+            return None
+        parts = ref.parts_for(event)
+        part = next((p for p in parts if p.slug == _param(params, 'part')), None) or (parts[0] if parts else None)
+        return f"eventos/{dv}/e{event.number}{part.slug if part else ''}/"
+    return None
+
+def public_urls() -> list:
+    """Every public page: landing, schedule per event, and per division the leaderboard
+    (overall and each part), eventos for each event/part, and the roster."""
+    ref = catalog.get()
+    urls = ['/', '/sponsors', '/info-lugar']
+    urls += [f"/horario?event={e.number}" for e in ref.events]
+    for d in ref.divisions:
+        dv = {'sexo': d.sex, 'cat': d.category}
+        urls.append(f"/leaderboard?{urlencode(dv)}")
+        urls += [f"/leaderboard?{urlencode({**dv, 'scope': 'part', 'event': p.event.number, 'part': p.slug})}"
+                 for p in ref.parts]
+        for e in ref.events:
+            urls += [f"/eventos?{urlencode({**dv, 'event': e.number, 'part': p.slug})}"
+                     for p in ref.parts_for(e)] or [f"/eventos?{urlencode({**dv, 'event': e.number})}"]
+        urls.append(f"/atletas?{urlencode(dv)}")
+    return urls
+
+def _write(target: Path, content: bytes) -> bool:
+    """Write only if the bytes differ (keeps mtimes, ETags and rsync diffs stable)."""
+    if target.exists() and target.read_bytes() == content:
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, target)
+    return True
+
+class Command(BaseCommand):
+    help = ("Render every public page to static HTML under --out (landing, horario, leaderboard per "
+            "division × scope × part, eventos per event/division/part, atletas, sponsors, venue). "
+            "Links are rewritten to <page>/index.html directories and referenced static/media files "
+            "are copied, so any file server can serve the folder from its root. Only files whose "
+            "content changed are rewritten.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--out', default='site', help='Output folder')
+        parser.add_argument('--jobs', type=int, default=min(8, (os.cpu_count() or 1) * 2),
+                            help='Pages rendered in parallel')
+        parser.add_argument('--prune', action='store_true', help='Delete files from earlier exports no longer produced')
+
+    def handle(self, *args, **opts):
+        self.out = Path(opts['out'])
+        if opts['jobs'] < 1:
+            raise CommandError("--jobs must be at least 1")
+        hosts = [h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*']
+        self.factory = RequestFactory(HTTP_HOST=hosts[0] if hosts else 'localhost')
+        self.handler = WSGIHandler()   # full middleware stack, as a real request would get
+        t0 = time.perf_counter()
+
+        pages = {}   # output dir → request URL
+        for url in public_urls():
+            split = urlsplit(url)
+            pages.setdefault(page_dir(split.path, parse_qs(split.query)), url)
+        pages.pop(None, None)
+
+        items = sorted(pages.items())
+        chunks = [items[i::opts['jobs']] for i in range(opts['jobs'])]
+        with ThreadPoolExecutor(opts['jobs']) as pool:
+            results = [r for chunk in pool.map(self._render_all, chunks) for r in chunk]
+
+        written, assets, errors = 0, set(), []
+        for target, url, status, changed, refs in results:
+            if status != 200:
+                errors.append(f"{url}: HTTP {status}")
+                continue
+            written += changed
+            assets |= refs
+        copied, missing = self._copy_assets(assets)
+        produced = {self.out / d / 'index.html' for d in pages} | {self.out / a.lstrip('/') for a in assets}
+
+        pruned = 0
+        if opts['prune']:
+            for p in self.out.rglob('*'):
+                if p.is_file() and p not in produced:
+                    os.remove(p)
+                    pruned += 1
+
+        for e in errors + [f"missing asset: {a}" for a in sorted(missing)]:
+            self.stdout.write(self.style.WARNING(f"  {e}"))
+        msg = (f"{len(pages) - len(errors)} pages ({written} rewritten), {len(assets) - len(missing)} assets "
+               f"({copied} copied){f', {pruned} stale files pruned' if pruned else ''} "
+               f"in {time.perf_counter() - t0:.2f}s → {self.out}")
+        self.stdout.write(self.style.WARNING(msg) if errors or missing else self.style.SUCCESS(msg))
+
+    def _render_all(self, chunk):
+        try:
+            return [self._render(target, url) for target, url in chunk]
+        finally:
+            connections.close_all()   # this worker thread's connections
+
+    def _render(self, target: str, url: str):
+        response = self.handler.get_response(self.factory.get(url))
+        if response.status_code != 200:
+            return target, url, response.status_code, False, set()
+        refs = set()
+        html = URL_ATTR_RE.sub(lambda m: self._link(m, url, refs), response.content.decode(response.charset))
+        changed = _write(self.out / target / 'index.html', html.encode(response.charset))
+        return target, url, 200, changed, refs
+
+    def _link(self, match, page_url: str, refs: set) -> str:
+        """One URL attribute rewritten to its static location; refs collects static/media files."""
+        attr, raw = match.groups()
+        if attr == 'srcset':
+            for candidate in unescape(raw).split(','):
+                self._asset(urljoin(page_url, candidate.strip().split(' ')[0]), refs)
+            return match.group(0)
+        split = urlsplit(urljoin(page_url, unescape(raw)))
+        if split.scheme or split.netloc:
+            return match.group(0)   # external
+        if split.path in LIVE_PATHS:
+            return ''
+        if self._asset(split.path, refs):
+            return match.group(0)
+        target = page_dir(split.path, parse_qs(split.query))
+        if target is None:
+            return match.group(0)
+        return f' {attr}="/{target}{"#" + split.fragment if split.fragment else ""}"'
+
+    def _asset(self, path: str, refs: set) -> bool:
+        if path.startswith((settings.STATIC_URL, settings.MEDIA_URL)):
+            refs.add(path)
+            return True
+        return False
+
+    def _copy_assets(self, assets: set):
+        copied, missing = 0, set()
+        for url in assets:
+            source = self._asset_source(url)
+            if source is None:
+                missing.add(url)
+                continue
+            target = self.out / url.lstrip('/')
+            # copy2 keeps mtime, so the next run's stat comparison is enough to skip it
+            if not (target.exists() and filecmp.cmp(source, target)):
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(source, target)
+                copied += 1
+        return copied, missing
+
+    def _asset_source(self, url: str) -> Optional[str]:
+        url = unquote(url)
+        if url.startswith(settings.STATIC_URL):
+            name = url[len(settings.STATIC_URL):]
+            collected = Path(settings.STATIC_ROOT) / name   # hashed names exist only after collectstatic
+            return str(collected) if collected.is_file() else finders.find(name)
+        full = Path(settings.MEDIA_ROOT) / url[len(settings.MEDIA_URL):]
+        return str(full) if full.is_file() else None
@@ -1,16 +1,24 @@
 import csv
+import hashlib
+import io
+import json
+import time
+from functools import cached_property
 from pathlib import Path
 from typing import Optional
-from django.core.files.base import ContentFile
 from django.core.files import File
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
-from django.conf import settings
 
 from core.models import (
     Division, Athlete, Event, Heat, LaneAssignment,
-    Sponsor, Venue, EventPart, EventDivisionSpec
+    Sponsor, Venue, EventPart, EventDivisionSpec, Score, ImportChecksum, refresh_heat_end_times
 )
+from core import caching, standings
+from core.signals import media_changed
+from core.storage import ContentAddressedStorage, blob_name, content_hash
+from core.utils import render_markdown
 
 def _bool(v):
     if v is None: return False
@@ -39,27 +47,154 @@ def _localize(dt_str: str):
     tz = timezone.get_default_timezone()
     return timezone.make_aware(naive, tz)
 
-def _copy_file_to_media(src_path: str, subdir: str) -> Optional[str]:
-    """Copy a local file into MEDIA_ROOT/subdir and return the relative path."""
+def _store_media(field, src_path: str, dry_run: bool = False) -> Optional[str]:
+    """
+    Save a local file through the field's storage, as an upload would be: in content-
+    addressed storage (core.storage) the same bytes always get the same cas/ name and are
+    written once. Returns the stored name; a dry run only works it out.
+    """
     if not src_path:
         return None
     p = Path(src_path)
-    if not p.exists():
+    if not p.is_file():
         print(f"  [warn] file not found: {src_path}")
         return None
-    target_dir = Path(settings.MEDIA_ROOT) / subdir
-    target_dir.mkdir(parents=True, exist_ok=True)
-    target = target_dir / p.name
-    if p.resolve() != target.resolve():
-        target.write_bytes(p.read_bytes())
-    rel = f"{subdir}/{p.name}"
-    return rel
+    with p.open('rb') as f:
+        content = File(f, name=p.name)
+        if isinstance(field.storage, ContentAddressedStorage):
+            name = blob_name(content_hash(content), p.name)
+            if dry_run or field.storage.exists(name):
+                return name
+        elif dry_run:
+            return field.generate_filename(None, p.name)
+        return field.storage.save(field.generate_filename(None, p.name), content)
+
+# Columns identifying a row across imports (venue.csv is a single row: file hash only)
+ROW_KEYS = {
+    'divisions.csv': ('sex', 'category'),
+    'events.csv': ('number',),
+    'event_parts.csv': ('event_number', 'slug'),
+    'event_division_specs.csv': ('event_number', 'part_slug', 'sex', 'category'),
+    'athletes.csv': ('bib',),
+    'heats.csv': ('event_number', 'sex', 'category', 'number'),
+    'lanes.csv': ('event_number', 'sex', 'category', 'heat_number', 'lane'),
+    'sponsors.csv': ('name',),
+    'venue.csv': (),
+}
+MEDIA_COLUMNS = ('photo_path', 'logo_path')
+
+def _sha1(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+class _Source:
+    """
+    One CSV file against the hashes its last import recorded (ImportChecksum).
+    rows() yields only new or changed rows, done(row, obj) marks one as applied and
+    save() stores the new hashes. The file hash is only stored once every changed row
+    went through, so rows skipped with a warning are retried on the next run.
+    """
+    def __init__(self, path: Path, force=False):
+        self.name, self.force, self.t0 = path.name, force, time.perf_counter()
+        text = path.read_bytes().decode('utf-8')
+        self.all_rows = list(csv.DictReader(io.StringIO(text, newline='')))
+        self.hashes = [(self._key(row), self._row_digest(row)) for row in self.all_rows]
+        self._by_row = {id(row): h for row, h in zip(self.all_rows, self.hashes)}
+        self.digest = _sha1(text + ''.join(d for _, d in self.hashes))
+        stored = (ImportChecksum.objects.filter(source=self.name, key='')
+                  .values_list('digest', flat=True).first())
+        self.unchanged = not force and stored == self.digest
+        self.changed, self.applied, self.removed = [], {}, []
+
+    def _key(self, row) -> str:
+        return '|'.join(_str(row.get(c)) for c in ROW_KEYS[self.name])
+
+    @staticmethod
+    def _row_digest(row) -> str:
+        # referenced photos/logos count as row content: a replaced file re-imports the row
+        stats = []
+        for col in MEDIA_COLUMNS:
+            p = Path(_str(row.get(col)))
+            if row.get(col) and p.is_file():
+                st = p.stat()
+                stats.append(f"{st.st_size}:{st.st_mtime_ns}")
+        return _sha1(json.dumps(row, sort_keys=True, ensure_ascii=False) + ''.join(stats))
+
+    def rows(self):
+        stored = dict(ImportChecksum.objects.filter(source=self.name).exclude(key='')
+                      .values_list('key', 'digest'))
+        keys = {key for key, _ in self.hashes}
+        self.removed = sorted(k for k in stored if k not in keys)
+        for row, (key, digest) in zip(self.all_rows, self.hashes):
+            if self.force or not key or stored.get(key) != digest:
+                self.changed.append(row)
+                yield row
+
+    def done(self, row, obj=None):
+        key, digest = self._by_row[id(row)]
+        self.applied[key] = (digest, obj)
+
+    def save(self):
+        qs = ImportChecksum.objects.filter(source=self.name)
+        qs.filter(key='').delete()
+        stale = [k for k in self.applied if k] + self.removed
+        for i in range(0, len(stale), 500):
+            qs.filter(key__in=stale[i:i + 500]).delete()
+        rows = [ImportChecksum(source=self.name, key=k, digest=d) for k, (d, _) in self.applied.items() if k]
+        if len(self.applied) == len({self._by_row[id(r)][0] for r in self.changed}):
+            rows.append(ImportChecksum(source=self.name, key='', digest=self.digest))
+        ImportChecksum.objects.bulk_create(rows, batch_size=500)
+
+class _Sync:
+    """
+    One model's rows in memory: existing rows come from a single query keyed by `key`,
+    upsert() diffs a CSV row against them, save() writes with bulk_create/bulk_update.
+    """
+    def __init__(self, model, key, qs=None):
+        self.model, self.key, self.qs = model, key, qs
+        self.new, self.dirty, self.changed = [], {}, {}
+
+    @cached_property
+    def rows(self):
+        # loaded on first use: files skipped as unchanged cost no query
+        return {self.key(o): o for o in (self.qs if self.qs is not None else self.model.objects.all())}
+
+    def upsert(self, key, defaults=None, **values):
+        """`defaults` only apply to new rows; `values` are set on new and existing ones."""
+        obj = self.rows.get(key)
+        if obj is None:
+            obj = self.rows[key] = self.model(**{**(defaults or {}), **values})
+            self.new.append(obj)
+            return obj
+        for field, value in values.items():
+            if getattr(obj, field) != value:
+                setattr(obj, field, value)
+                if obj.pk is not None:
+                    self.dirty[obj.pk] = obj
+                    self.changed.setdefault(obj.pk, set()).add(field)
+        return obj
+
+    def save(self):
+        """(created, updated). Bulk writes skip auto_now, so updated_at is set here."""
+        self.model.objects.bulk_create(self.new, batch_size=500)
+        if self.dirty:
+            fields = set().union(*self.changed.values())
+            if any(f.name == 'updated_at' for f in self.model._meta.fields):
+                now = timezone.now()
+                for obj in self.dirty.values():
+                    obj.updated_at = now
+                fields.add('updated_at')
+            self.model.objects.bulk_update(list(self.dirty.values()), sorted(fields), batch_size=500)
+        counts = (len(self.new), len(self.dirty))
+        self.new, self.dirty, self.changed = [], {}, {}
+        return counts
 
 class Command(BaseCommand):
-    help = "Import competition data from a folder of CSV files."
+    help = "Import competition data from a folder of CSV files (all-or-nothing)."
 
     def add_arguments(self, parser):
         parser.add_argument('--path', required=True, help='Path to folder containing CSVs')
+        parser.add_argument('--dry-run', action='store_true', help='Print the create/update/delete diff and roll back')
+        parser.add_argument('--force', action='store_true', help='Ignore recorded checksums and re-apply every row')
 
     def handle(self, *args, **opts):
         folder = Path(opts['path'])
@@ -67,247 +202,267 @@ class Command(BaseCommand):
             raise CommandError(f"Folder does not exist: {folder}")
 
         self.stdout.write(self.style.MIGRATE_HEADING(f"Importing from {folder}"))
+        self.changed, self.dry_run, self.force = False, opts['dry_run'], opts['force']
+        # bulk writes send no model signals: standings and page caches are refreshed once at the end
+        with transaction.atomic():
+            self._import(folder)
+            if self.dry_run:
+                transaction.set_rollback(True)
+            elif self.changed:
+                refresh_heat_end_times()   # bulk writes skip Heat.save()
+                transaction.on_commit(self._refresh)
+        if self.dry_run:
+            self.stdout.write(self.style.MIGRATE_HEADING("Dry run: nothing was written"))
+        else:
+            self.stdout.write(self.style.MIGRATE_HEADING("Import complete ✅"))
+
+    def _refresh(self):
+        t0 = time.perf_counter()
+        rows = standings.rebuild_all()
+        caching.bump(*caching.ALL_SCOPES)
+        self.stdout.write(self.style.SUCCESS(f"Standings rebuilt: {rows} rows in {time.perf_counter() - t0:.2f}s"))
 
+    def _source(self, folder: Path, name: str, label: str) -> Optional[_Source]:
+        """The CSV to apply, or None when it's missing or identical to the last import."""
+        path = folder / name
+        if not path.exists():
+            return None
+        src = _Source(path, force=self.force)
+        if src.unchanged:
+            self.stdout.write(f"{label}: unchanged, skipped")
+            return None
+        return src
+
+    def _report(self, label, src: _Source, sync: Optional[_Sync] = None):
+        """Write the model's pending rows and the new checksums, then print what changed."""
+        created = [k for k, (_, obj) in src.applied.items() if obj is not None and obj.pk is None]
+        updated = {k: sorted(sync.changed[obj.pk]) for k, (_, obj) in src.applied.items()
+                   if sync and obj is not None and obj.pk in sync.changed}
+        if sync:
+            sync.save()
+        src.save()
+        self.changed = self.changed or bool(created or updated)
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: {len(src.all_rows)} rows, {len(src.changed)} changed, {len(created)} new, "
+            f"{len(updated)} updated, {len(src.removed)} removed in {time.perf_counter() - src.t0:.2f}s"))
+        if self.dry_run:
+            for k in created:
+                self.stdout.write(f"  + {k}")
+            for k, fields in updated.items():
+                self.stdout.write(f"  ~ {k} ({', '.join(fields)})")
+            for k in src.removed:
+                self.stdout.write(f"  - {k} (gone from the CSV; not deleted, use /admin)")
+
+    def _media_saved(self, model, field: str, changed: list):
+        """Blob refcounts and derivatives for files set by bulk writes (what core.signals does on save)."""
+        for obj, old in changed:
+            media_changed(model, old, getattr(obj, field).name or '')
+
+    def _import(self, folder: Path):
         # 1) Divisions
-        divs_by_key = {}
-        path = folder / 'divisions.csv'
-        if path.exists():
-            with path.open(newline='', encoding='utf-8') as f:
-                for row in csv.DictReader(f):
-                    sex = _str(row.get('sex')).upper()  # M/F
-                    category = _str(row.get('category')).lower()  # sx/intermedio/rx
-                    display_name = _str(row.get('display_name'))
-                    sort_order = _int(row.get('sort_order'), 0)
-                    d, _ = Division.objects.get_or_create(
-                        sex=sex, category=category,
-                        defaults={'display_name': display_name or f"{category} {sex}", 'sort_order': sort_order}
-                    )
-                    if display_name and d.display_name != display_name:
-                        d.display_name = display_name
-                        d.sort_order = sort_order
-                        d.save()
-                    divs_by_key[(sex, category)] = d
-            self.stdout.write(self.style.SUCCESS(f"Divisions: {len(divs_by_key)}"))
+        divisions = _Sync(Division, lambda d: (d.sex, d.category))
+        src = self._source(folder, 'divisions.csv', "Divisions")
+        if src:
+            for row in src.rows():
+                sex = _str(row.get('sex')).upper()  # M/F
+                category = _str(row.get('category')).lower()  # sx/intermedio/rx
+                display_name = _str(row.get('display_name'))
+                sort_order = _int(row.get('sort_order'), 0)
+                values = {'display_name': display_name, 'sort_order': sort_order} if display_name else {}
+                src.done(row, divisions.upsert((sex, category), {'sex': sex, 'category': category,
+                                                                 'display_name': f"{category} {sex}", 'sort_order': sort_order}, **values))
+            self._report("Divisions", src, divisions)
 
         # 2) Events
-        events_by_num = {}
-        path = folder / 'events.csv'
-        if path.exists():
-            with path.open(newline='', encoding='utf-8') as f:
-                for row in csv.DictReader(f):
-                    number = _int(row.get('number'))
-                    name = _str(row.get('name'))
-                    typ = _str(row.get('type')).lower()  # time/amrap/max (legacy)
-                    cap_seconds = _int(row.get('cap_seconds'), 0)
-                    tiebreak_enabled = _bool(row.get('tiebreak_enabled'))
-                    description_md = row.get('description_md') or ''
-                    if number is None:
-                        continue
-                    e, created = Event.objects.get_or_create(number=number, defaults={
-                        'name': name or f"Evento {number}",
-                        'type': typ or 'time',
-                        'cap_seconds': cap_seconds or 0,
-                        'tiebreak_enabled': tiebreak_enabled,
-                        'description_md': description_md
-                    })
-                    # update if changed
-                    changed = False
-                    if name and e.name != name: e.name, changed = name, True
-                    if typ and e.type != typ: e.type, changed = typ, True
-                    if cap_seconds is not None and e.cap_seconds != cap_seconds: e.cap_seconds, changed = cap_seconds, True
-                    if e.tiebreak_enabled != tiebreak_enabled: e.tiebreak_enabled, changed = tiebreak_enabled, True
-                    if description_md and e.description_md != description_md: e.description_md, changed = description_md, True
-                    if changed: e.save()
-                    events_by_num[number] = e
-            self.stdout.write(self.style.SUCCESS(f"Events: {len(events_by_num)}"))
-
-        # 3) Event Parts
-        parts = {}
-        path = folder / 'event_parts.csv'
-        if path.exists():
-            with path.open(newline='', encoding='utf-8') as f:
-                for row in csv.DictReader(f):
-                    ev_no = _int(row.get('event_number'))
-                    slug = _str(row.get('slug'))
-                    name = _str(row.get('name'))
-                    scoring = _str(row.get('scoring'))  # time_then_reps / reps / weight
-                    counts = _bool(row.get('counts_as_event'))
-                    order = _int(row.get('order'), 1)
-                    e = events_by_num.get(ev_no)
-                    if not e:
-                        self.stdout.write(self.style.WARNING(f"  Skip part: event {ev_no} not found"))
-                        continue
-                    p, _ = EventPart.objects.get_or_create(event=e, slug=slug, defaults={
-                        'name': name or (f"Part {slug}" if slug else 'Main'),
-                        'scoring': scoring or 'time_then_reps',
-                        'counts_as_event': counts,
-                        'order': order,
-                    })
-                    # updates
-                    changed = False
-                    if name and p.name != name: p.name, changed = name, True
-                    if scoring and p.scoring != scoring: p.scoring, changed = scoring, True
-                    if p.counts_as_event != counts: p.counts_as_event, changed = counts, True
-                    if p.order != order: p.order, changed = order, True
-                    if changed: p.save()
-                    parts[(ev_no, slug)] = p
-            self.stdout.write(self.style.SUCCESS(f"Event parts: {len(parts)}"))
+        events = _Sync(Event, lambda e: e.number)
+        src = self._source(folder, 'events.csv', "Events")
+        if src:
+            for row in src.rows():
+                number = _int(row.get('number'))
+                name = _str(row.get('name'))
+                typ = _str(row.get('type')).lower()  # time/amrap/max (legacy)
+                cap_seconds = _int(row.get('cap_seconds'), 0)
+                tiebreak_enabled = _bool(row.get('tiebreak_enabled'))
+                description_md = row.get('description_md') or ''
+                if number is None:
+                    continue
+                values = {'cap_seconds': cap_seconds, 'tiebreak_enabled': tiebreak_enabled}
+                if name: values['name'] = name
+                if typ: values['type'] = typ
+                if description_md:
+                    # bulk writes skip Event.save(), which keeps description_html in step
+                    values.update(description_md=description_md, description_html=render_markdown(description_md))
+                src.done(row, events.upsert(number, {'number': number, 'name': f"Evento {number}", 'type': 'time',
+                                                     'description_md': ''}, **values))
+            self._report("Events", src, events)
+
+        # 3) Event Parts (scoring/counts changes re-key that part's scores, as part_saved does)
+        parts = _Sync(EventPart, lambda p: (p.event.number, p.slug), EventPart.objects.select_related('event'))
+        src = self._source(folder, 'event_parts.csv', "Event parts")
+        if src:
+            for row in src.rows():
+                ev_no = _int(row.get('event_number'))
+                slug = _str(row.get('slug'))
+                name = _str(row.get('name'))
+                scoring = _str(row.get('scoring'))  # time_then_reps / reps / weight
+                counts = _bool(row.get('counts_as_event'))
+                order = _int(row.get('order'), 1)
+                e = events.rows.get(ev_no)
+                if not e:
+                    self.stdout.write(self.style.WARNING(f"  Skip part: event {ev_no} not found"))
+                    continue
+                values = {'counts_as_event': counts, 'order': order}
+                if name: values['name'] = name
+                if scoring: values['scoring'] = scoring
+                src.done(row, parts.upsert((ev_no, slug), {'event': e, 'slug': slug, 'name': f"Part {slug}" if slug else 'Main',
+                                                           'scoring': 'time_then_reps'}, **values))
+            rekey = [p for pk, p in parts.dirty.items() if 'scoring' in parts.changed[pk]]
+            self._report("Event parts", src, parts)
+            scores = list(Score.objects.filter(part__in=rekey).select_related('part'))
+            for sc in scores:
+                sc.set_rank_keys(sc.part.scoring)
+            Score.objects.bulk_update(scores, Score.RANK_FIELDS, batch_size=500)
 
         # 4) Event Division Specs
-        path = folder / 'event_division_specs.csv'
-        if path.exists():
-            with path.open(newline='', encoding='utf-8') as f:
-                for row in csv.DictReader(f):
-                    ev_no = _int(row.get('event_number'))
-                    slug = _str(row.get('part_slug'))
-                    sex = _str(row.get('sex')).upper()
-                    category = _str(row.get('category')).lower()
-                    cap_seconds = _int(row.get('cap_seconds'), None)
-                    tiebreak_label = _str(row.get('tiebreak_label'))
-                    description_md = row.get('description_md') or ''
-                    p = parts.get((ev_no, slug))
-                    d = divs_by_key.get((sex, category))
-                    if not p or not d:
-                        self.stdout.write(self.style.WARNING(f"  Skip spec: part ({ev_no},{slug}) or division ({sex},{category}) missing"))
-                        continue
-                    spec, _ = EventDivisionSpec.objects.get_or_create(part=p, division=d, defaults={
-                        'cap_seconds': cap_seconds,
-                        'tiebreak_label': tiebreak_label,
-                        'description_md': description_md,
-                    })
-                    changed = False
-                    if cap_seconds is not None and spec.cap_seconds != cap_seconds: spec.cap_seconds, changed = cap_seconds, True
-                    if tiebreak_label and spec.tiebreak_label != tiebreak_label: spec.tiebreak_label, changed = tiebreak_label, True
-                    if description_md and spec.description_md != description_md: spec.description_md, changed = description_md, True
-                    if changed: spec.save()
-            self.stdout.write(self.style.SUCCESS("Event division specs imported"))
+        specs = _Sync(EventDivisionSpec, lambda s: (s.part_id, s.division_id))
+        src = self._source(folder, 'event_division_specs.csv', "Event division specs")
+        if src:
+            for row in src.rows():
+                ev_no = _int(row.get('event_number'))
+                slug = _str(row.get('part_slug'))
+                sex = _str(row.get('sex')).upper()
+                category = _str(row.get('category')).lower()
+                cap_seconds = _int(row.get('cap_seconds'), None)
+                tiebreak_label = _str(row.get('tiebreak_label'))
+                description_md = row.get('description_md') or ''
+                p = parts.rows.get((ev_no, slug))
+                d = divisions.rows.get((sex, category))
+                if not p or not d:
+                    self.stdout.write(self.style.WARNING(f"  Skip spec: part ({ev_no},{slug}) or division ({sex},{category}) missing"))
+                    continue
+                values = {}
+                if cap_seconds is not None: values['cap_seconds'] = cap_seconds
+                if tiebreak_label: values['tiebreak_label'] = tiebreak_label
+                if description_md:
+                    values.update(description_md=description_md, description_html=render_markdown(description_md))
+                src.done(row, specs.upsert((p.pk, d.pk), {'part': p, 'division': d}, **values))
+            self._report("Event division specs", src, specs)
 
         # 5) Athletes
-        athletes_by_bib = {}
-        path = folder / 'athletes.csv'
-        if path.exists():
-            with path.open(newline='', encoding='utf-8') as f:
-                for row in csv.DictReader(f):
-                    bib = _str(row.get('bib'))
-                    if not bib:
-                        continue
-                    first = _str(row.get('first_name'))
-                    last = _str(row.get('last_name'))
-                    disp = _str(row.get('display_name'))
-                    box = _str(row.get('box_gym'))
-                    sex = _str(row.get('sex')).upper()
-                    category = _str(row.get('category')).lower()
-                    photo_path = _str(row.get('photo_path'))
-                    div = divs_by_key.get((sex, category))
-                    if not div:
-                        self.stdout.write(self.style.WARNING(f"  Skip athlete {bib}: division ({sex},{category}) not found"))
-                        continue
-                    a, created = Athlete.objects.get_or_create(bib=bib, defaults={
-                        'first_name': first, 'last_name': last, 'display_name': disp,
-                        'box_gym': box, 'division': div
-                    })
-                    changed = False
-                    if a.first_name != first: a.first_name, changed = first, True
-                    if a.last_name != last: a.last_name, changed = last, True
-                    if disp and a.display_name != disp: a.display_name, changed = disp, True
-                    if box and a.box_gym != box: a.box_gym, changed = box, True
-                    if a.division_id != div.id: a.division, changed = div, True
-                    # photo
-                    if photo_path:
-                        rel = _copy_file_to_media(photo_path, 'athletes')
-                        if rel and (not a.photo or a.photo.name != rel):
-                            a.photo.name = rel
-                            changed = True
-                    if changed: a.save()
-                    athletes_by_bib[bib] = a
-            self.stdout.write(self.style.SUCCESS(f"Athletes: {len(athletes_by_bib)}"))
+        athletes = _Sync(Athlete, lambda a: a.bib)
+        media = []   # (object, file name it had before) for the rows whose file changed
+        src = self._source(folder, 'athletes.csv', "Athletes")
+        if src:
+            for row in src.rows():
+                bib = _str(row.get('bib'))
+                if not bib:
+                    continue
+                first = _str(row.get('first_name'))
+                last = _str(row.get('last_name'))
+                disp = _str(row.get('display_name'))
+                box = _str(row.get('box_gym'))
+                sex = _str(row.get('sex')).upper()
+                category = _str(row.get('category')).lower()
+                photo_path = _str(row.get('photo_path'))
+                div = divisions.rows.get((sex, category))
+                if not div:
+                    self.stdout.write(self.style.WARNING(f"  Skip athlete {bib}: division ({sex},{category}) not found"))
+                    continue
+                values = {'first_name': first, 'last_name': last, 'division_id': div.pk}
+                if disp: values['display_name'] = disp
+                if box: values['box_gym'] = box
+                # photo
+                if photo_path:
+                    name = _store_media(Athlete._meta.get_field('photo'), photo_path, self.dry_run)
+                    if name: values['photo'] = name
+                before = athletes.rows[bib].photo.name if bib in athletes.rows else ''
+                a = athletes.upsert(bib, {'bib': bib}, **values)
+                if (a.photo.name or '') != (before or ''):
+                    media.append((a, before or ''))
+                src.done(row, a)
+            self._report("Athletes", src, athletes)
+            self._media_saved(Athlete, 'photo', media)
 
         # 6) Heats
-        heats_index = {}
-        path = folder / 'heats.csv'
-        if path.exists():
-            with path.open(newline='', encoding='utf-8') as f:
-                for row in csv.DictReader(f):
-                    ev_no = _int(row.get('event_number'))
-                    sex = _str(row.get('sex')).upper()
-                    category = _str(row.get('category')).lower()
-                    number = _int(row.get('number'))
-                    start_time = _localize(_str(row.get('start_time')))
-                    e = events_by_num.get(ev_no)
-                    d = divs_by_key.get((sex, category))
-                    if not e or not d or not number:
-                        self.stdout.write(self.style.WARNING(f"  Skip heat: missing event/division/number"))
-                        continue
-                    h, _ = Heat.objects.get_or_create(event=e, division=d, number=number, defaults={
-                        'start_time': start_time or timezone.now(), 'lane_count': 8
-                    })
-                    if start_time and h.start_time != start_time:
-                        h.start_time = start_time
-                        h.save()
-                    heats_index[(ev_no, sex, category, number)] = h
-            self.stdout.write(self.style.SUCCESS(f"Heats imported: {len(heats_index)}"))
+        heats = _Sync(Heat, lambda h: (h.event_id, h.division_id, h.number))
+        src = self._source(folder, 'heats.csv', "Heats")
+        if src:
+            for row in src.rows():
+                ev_no = _int(row.get('event_number'))
+                sex = _str(row.get('sex')).upper()
+                category = _str(row.get('category')).lower()
+                number = _int(row.get('number'))
+                start_time = _localize(_str(row.get('start_time')))
+                e = events.rows.get(ev_no)
+                d = divisions.rows.get((sex, category))
+                if not e or not d or not number:
+                    self.stdout.write(self.style.WARNING(f"  Skip heat: missing event/division/number"))
+                    continue
+                src.done(row, heats.upsert((e.pk, d.pk, number),
+                                           {'event': e, 'division': d, 'number': number, 'start_time': timezone.now(),
+                                            'end_time': timezone.now(), 'lane_count': 8},
+                                           **({'start_time': start_time} if start_time else {})))
+            self._report("Heats", src, heats)
 
         # 7) Lane assignments
-        path = folder / 'lanes.csv'
-        if path.exists():
-            with path.open(newline='', encoding='utf-8') as f:
-                for row in csv.DictReader(f):
-                    ev_no = _int(row.get('event_number'))
-                    sex = _str(row.get('sex')).upper()
-                    category = _str(row.get('category')).lower()
-                    heat_no = _int(row.get('heat_number'))
-                    lane = _int(row.get('lane'))
-                    bib = _str(row.get('bib'))
-                    h = heats_index.get((ev_no, sex, category, heat_no))
-                    a = athletes_by_bib.get(bib)
-                    if not h or not a or not lane:
-                        self.stdout.write(self.style.WARNING(f"  Skip lane: missing heat/athlete/lane for bib={bib}"))
-                        continue
-                    la, _ = LaneAssignment.objects.get_or_create(heat=h, lane=lane, defaults={'athlete': a})
-                    if la.athlete_id != a.id:
-                        la.athlete = a
-                        la.save()
-            self.stdout.write(self.style.SUCCESS("Lane assignments imported"))
+        lanes = _Sync(LaneAssignment, lambda la: (la.heat_id, la.lane))
+        src = self._source(folder, 'lanes.csv', "Lane assignments")
+        if src:
+            for row in src.rows():
+                ev_no = _int(row.get('event_number'))
+                sex = _str(row.get('sex')).upper()
+                category = _str(row.get('category')).lower()
+                heat_no = _int(row.get('heat_number'))
+                lane = _int(row.get('lane'))
+                bib = _str(row.get('bib'))
+                e = events.rows.get(ev_no)
+                d = divisions.rows.get((sex, category))
+                h = heats.rows.get((e.pk, d.pk, heat_no)) if e and d else None
+                a = athletes.rows.get(bib)
+                if not h or not a or not lane:
+                    self.stdout.write(self.style.WARNING(f"  Skip lane: missing heat/athlete/lane for bib={bib}"))
+                    continue
+                src.done(row, lanes.upsert((h.pk, lane), {'heat': h, 'lane': lane}, athlete_id=a.pk))
+            self._report("Lane assignments", src, lanes)
 
         # 8) Sponsors
-        path = folder / 'sponsors.csv'
-        if path.exists():
-            with path.open(newline='', encoding='utf-8') as f:
-                for row in csv.DictReader(f):
-                    name = _str(row.get('name'))
-                    if not name: continue
-                    tier = _str(row.get('tier'))
-                    link = _str(row.get('link_url'))
-                    logo_path = _str(row.get('logo_path'))
-                    s, _ = Sponsor.objects.get_or_create(name=name, defaults={'tier': tier, 'link_url': link})
-                    changed = False
-                    if tier and s.tier != tier: s.tier, changed = tier, True
-                    if link and s.link_url != link: s.link_url, changed = link, True
-                    if logo_path:
-                        rel = _copy_file_to_media(logo_path, 'sponsors')
-                        if rel and (not s.logo or s.logo.name != rel):
-                            s.logo.name = rel
-                            changed = True
-                    if changed: s.save()
-            self.stdout.write(self.style.SUCCESS("Sponsors imported"))
+        sponsors = _Sync(Sponsor, lambda s: s.name)
+        media = []
+        src = self._source(folder, 'sponsors.csv', "Sponsors")
+        if src:
+            for row in src.rows():
+                name = _str(row.get('name'))
+                if not name: continue
+                tier = _str(row.get('tier'))
+                link = _str(row.get('link_url'))
+                logo_path = _str(row.get('logo_path'))
+                values = {}
+                if tier: values['tier'] = tier
+                if link: values['link_url'] = link
+                if logo_path:
+                    stored = _store_media(Sponsor._meta.get_field('logo'), logo_path, self.dry_run)
+                    if stored: values['logo'] = stored
+                before = sponsors.rows[name].logo.name if name in sponsors.rows else ''
+                sp = sponsors.upsert(name, {'name': name, 'tier': tier, 'link_url': link}, **values)
+                if (sp.logo.name or '') != (before or ''):
+                    media.append((sp, before or ''))
+                src.done(row, sp)
+            self._report("Sponsors", src, sponsors)
+            self._media_saved(Sponsor, 'logo', media)
 
         # 9) Venue (single row)
-        path = folder / 'venue.csv'
-        if path.exists():
-            with path.open(newline='', encoding='utf-8') as f:
-                rows = list(csv.DictReader(f))
-                if rows:
-                    r = rows[0]
-                    name = _str(r.get('name')) or 'Sede'
-                    v, _ = Venue.objects.get_or_create(name=name)
-                    v.address = _str(r.get('address'))
-                    v.map_link = _str(r.get('map_link'))
-                    v.parking_notes = r.get('parking_notes') or ''
-                    v.checkin_notes = r.get('checkin_notes') or ''
-                    # Optional socials if you added those fields
-                    if hasattr(v, 'instagram_url'): v.instagram_url = _str(r.get('instagram_url'))
-                    if hasattr(v, 'facebook_url'): v.facebook_url = _str(r.get('facebook_url'))
-                    v.save()
-            self.stdout.write(self.style.SUCCESS("Venue imported"))
-
-        self.stdout.write(self.style.MIGRATE_HEADING("Import complete ✅"))
+        src = self._source(folder, 'venue.csv', "Venue")
+        if src:
+            for r in list(src.rows())[:1]:
+                name = _str(r.get('name')) or 'Sede'
+                v, _ = Venue.objects.get_or_create(name=name)
+                v.address = _str(r.get('address'))
+                v.map_link = _str(r.get('map_link'))
+                v.parking_notes = r.get('parking_notes') or ''
+                v.checkin_notes = r.get('checkin_notes') or ''
+                # Optional socials if you added those fields
+                if hasattr(v, 'instagram_url'): v.instagram_url = _str(r.get('instagram_url'))
+                if hasattr(v, 'facebook_url'): v.facebook_url = _str(r.get('facebook_url'))
+                v.save()
+                src.done(r, v)
+            self._report("Venue", src)
@@ -0,0 +1,163 @@
+import csv
+import hashlib
+import io
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import EventPart, ImportChecksum
+from core import scoring
+
+SOURCE = 'results'   # ImportChecksum.source: one row per result file, keyed by file name
+RETRIES = 3          # rounds for rows that lost a race with a judge's edit
+UNTERMINATED_WAIT = 10   # × --settle: a last line without newline may be a cut-off row
+
+# timing-system column → Score field; columns missing from a file leave the stored value alone
+COLUMNS = {
+    'finished': 'finished',
+    'time': 'time_seconds',
+    'reps': 'reps',
+    'weight': 'weight',
+    'tiebreak': 'tiebreak_seconds',
+    'penalty_seconds': 'penalty_seconds',
+    'penalty_reps': 'penalty_reps',
+    'notes': 'notes',
+}
+TIME_COLUMNS = ('time', 'tiebreak')
+
+def _seconds(v: str):
+    """'754.2', '12:34.2' or '1:02:03' → seconds; anything else is passed on for the form to reject."""
+    v = v.strip()
+    try:
+        total = 0.0
+        for piece in v.split(':'):
+            total = total * 60 + float(piece)
+        return total
+    except ValueError:
+        return v
+
+def _value(column: str, v: str):
+    v = (v or '').strip()
+    if column == 'finished':
+        return v.lower() in ('1', 'true', 't', 'yes', 'y', 'si', 'sí')
+    if column == 'notes':
+        return v
+    if v == '':
+        return None
+    return _seconds(v) if column in TIME_COLUMNS else v
+
+class Command(BaseCommand):
+    help = ("Apply result CSVs the timing system drops into a folder (one per heat): "
+            "event_number,part_slug,bib + any of " + ','.join(COLUMNS) + ". "
+            "Rows are upserted by (part, bib) in bulk and only the affected standings are refreshed. "
+            "Files are read once they stop changing; re-sent identical files are skipped. "
+            "--watch keeps polling the folder.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='results', help='Folder the timing system writes into')
+        parser.add_argument('--watch', action='store_true', help='Keep polling the folder')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls with --watch')
+        parser.add_argument('--settle', type=float, default=2.0,
+                            help='Seconds a file must go unmodified before it is read (files arriving mid-write)')
+        parser.add_argument('--force', action='store_true', help='Re-apply files already applied unchanged')
+
+    def handle(self, *args, **opts):
+        folder = Path(opts['path'])
+        if not folder.is_dir():
+            raise CommandError(f"Folder not found: {folder}")
+        self.settle, self.force = opts['settle'], opts['force']
+        self.stats = {}   # name → (size, mtime_ns) at the last poll
+        self.done = {}    # name → (size, mtime_ns) of the version last handled
+        if opts['watch']:
+            self.stdout.write(f"Watching {folder} every {opts['interval']}s (Ctrl+C to stop)")
+        try:
+            while True:
+                self._poll(folder, opts['watch'])
+                if not opts['watch']:
+                    break
+                time.sleep(opts['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def _poll(self, folder: Path, watching: bool):
+        for path in sorted(folder.glob('*.csv')):
+            try:
+                st = path.stat()
+            except OSError:
+                continue   # renamed/removed between glob and stat
+            stat = (st.st_size, st.st_mtime_ns)
+            previous, self.stats[path.name] = self.stats.get(path.name), stat
+            if self.done.get(path.name) == stat:
+                continue
+            # mid-write: wait until it has been quiet for --settle (and, polling, unchanged since last look)
+            if time.time() - st.st_mtime < self.settle or (watching and previous != stat):
+                if not watching:
+                    self.stdout.write(self.style.WARNING(f"  {path.name}: still being written, skipped"))
+                continue
+            self._ingest(path, stat, time.time() - st.st_mtime, watching)
+
+    def _ingest(self, path: Path, stat, age: float, watching: bool):
+        data = path.read_bytes()
+        if data and not data.endswith(b'\n') and age < self.settle * UNTERMINATED_WAIT:
+            if not watching:
+                self.stdout.write(self.style.WARNING(f"  {path.name}: last line incomplete, skipped"))
+            return
+        digest = hashlib.sha1(data).hexdigest()
+        stored = ImportChecksum.objects.filter(source=SOURCE, key=path.name).values_list('digest', flat=True).first()
+        if stored == digest and not self.force:
+            self.done[path.name] = stat
+            return   # re-sent unchanged
+        try:
+            rows = list(csv.DictReader(io.StringIO(data.decode('utf-8-sig'))))
+        except (UnicodeDecodeError, csv.Error) as e:
+            self.stdout.write(self.style.ERROR(f"  {path.name}: unreadable ({e}); waiting for a new version"))
+            self.done[path.name] = stat
+            return
+
+        records, errors = self._records(path.name, rows)
+        results = scoring.apply_batch(records, idempotent=False)
+        for _ in range(RETRIES):   # lost a race with a judge's edit: retry on fresh versions
+            retry = [i for i, r in enumerate(results) if r.get('conflict')]
+            if not retry:
+                break
+            for i, r in zip(retry, scoring.apply_batch([records[i] for i in retry], idempotent=False)):
+                results[i] = r
+
+        errors += [(r['key'], '; '.join(f"{f}: {' '.join(m)}" for f, m in r['errors'].items()))
+                   for r in results if not r['ok']]
+        errors.sort(key=lambda e: int(e[0].rsplit(':', 1)[1]))
+        applied = sum(1 for r in results if r['ok'] and not r.get('unchanged'))
+        unchanged = sum(1 for r in results if r.get('unchanged'))
+        msg = f"  {path.name}: {applied} applied, {unchanged} unchanged, {len(errors)} errors"
+        self.stdout.write(self.style.WARNING(msg) if errors else self.style.SUCCESS(msg))
+        for key, e in errors:
+            self.stdout.write(f"    {key}: {e}")
+
+        if any(r.get('conflict') for r in results):
+            return   # not recorded: the next poll tries the file again
+        # bad rows won't get better by re-reading the same bytes; a corrected file has a new digest
+        ImportChecksum.objects.update_or_create(source=SOURCE, key=path.name, defaults={'digest': digest})
+        self.done[path.name] = stat
+
+    def _records(self, name: str, rows: list):
+        """core.scoring records for the rows; rows naming an unknown part are reported here."""
+        parts = {(p.event.number, p.slug): p.pk for p in EventPart.objects.select_related('event')}
+        records, errors = [], []
+        for line, row in enumerate(rows, start=2):   # line 1 is the header
+            key = f"{name}:{line}"
+            try:
+                part = parts.get((int(row.get('event_number') or ''), (row.get('part_slug') or '').strip()))
+            except ValueError:
+                part = None
+            if part is None:
+                errors.append((key, f"unknown event_number/part_slug "
+                                    f"{row.get('event_number')!r}/{row.get('part_slug')!r}"))
+                continue
+            record = {'key': key, 'part': part, 'bib': (row.get('bib') or '').strip()}
+            for column, field in COLUMNS.items():
+                if column in row:
+                    record[field] = _value(column, row[column])
+            if 'finished' not in row and 'time' in row:
+                record['finished'] = record['time_seconds'] is not None   # no finished column: a time means done
+            records.append(record)
+        return records, errors
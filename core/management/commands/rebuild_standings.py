@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from core.standings import rebuild_all
+
+class Command(BaseCommand):
+    help = "Recompute the materialized Standing table for every division and part."
+
+    def handle(self, *args, **opts):
+        n = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"Standings rebuilt: {n} rows"))
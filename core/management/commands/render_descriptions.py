@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import caching
+from core.models import Event, EventDivisionSpec
+from core.utils import render_markdown
+
+class Command(BaseCommand):
+    help = ("Re-render description_html from description_md for events and division specs "
+            "(backfill after upgrading, or after the Markdown renderer changes).")
+
+    def handle(self, *args, **opts):
+        total = 0
+        with transaction.atomic():
+            for model in (Event, EventDivisionSpec):
+                stale = []
+                for obj in model.objects.only('pk', 'description_md', 'description_html'):
+                    html = render_markdown(obj.description_md)
+                    if obj.description_html != html:
+                        obj.description_html = html
+                        stale.append(obj)
+                # bulk_update: no save() signals, and updated_at stays (the text didn't change)
+                model.objects.bulk_update(stale, ['description_html'], batch_size=500)
+                total += len(stale)
+                self.stdout.write(f"  {model.__name__}: {len(stale)} re-rendered")
+            if total:
+                transaction.on_commit(lambda: caching.bump(caching.EVENTS))
+        self.stdout.write(self.style.SUCCESS(f"Descriptions rendered: {total} rows updated"))
@@ -0,0 +1,60 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from core.models import Division, Event, Heat, LaneAssignment
+from core.schedule import seed_heats
+
+class Command(BaseCommand):
+    help = ("Rebuild an event's heats and lanes from the current overall standings: per division, "
+            "leaders in the last heat and the center lanes. Safe to re-run; unchanged heats/lanes "
+            "are left alone.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, required=True, help='Event number')
+        parser.add_argument('--start', help="First heat, 'YYYY-MM-DD HH:MM' local time "
+                                            "(default: the event's current first heat)")
+        parser.add_argument('--division', action='append', metavar='SEX:CATEGORY',
+                            help='Only these divisions, e.g. F:rx (repeatable; default all)')
+        parser.add_argument('--lanes', type=int, default=8, help='Lanes per heat')
+        parser.add_argument('--changeover', type=int, default=5, help='Minutes between one cap and the next heat')
+
+    def handle(self, *args, **opts):
+        event = Event.objects.filter(number=opts['event']).first()
+        if event is None:
+            raise CommandError(f"Event {opts['event']} not found")
+        if opts['lanes'] < 1:
+            raise CommandError("--lanes must be at least 1")
+
+        if opts['start']:
+            try:
+                start = timezone.make_aware(datetime.strptime(opts['start'].strip(), "%Y-%m-%d %H:%M"),
+                                            timezone.get_default_timezone())
+            except ValueError:
+                raise CommandError(f"--start: expected 'YYYY-MM-DD HH:MM', got {opts['start']!r}")
+        else:
+            start = Heat.objects.filter(event=event).aggregate(m=Min('start_time'))['m']
+            if start is None:
+                raise CommandError(f"Event {event.number} has no heats yet: pass --start")
+
+        divisions = Division.objects.all()
+        if opts['division']:
+            wanted = {tuple(d.split(':', 1)) for d in opts['division']}
+            divisions = [d for d in divisions if (d.sex, d.category) in wanted]
+            missing = wanted - {(d.sex, d.category) for d in divisions}
+            if missing:
+                raise CommandError(f"Unknown division(s): {', '.join(':'.join(m) for m in sorted(missing))}")
+
+        t0 = time.perf_counter()
+        result = seed_heats(event, start, divisions, lane_count=opts['lanes'], changeover=opts['changeover'])
+        self.stdout.write(self.style.SUCCESS(
+            f"E{event.number}: {result.heats} heats ({result.created} new, {result.moved} moved, "
+            f"{result.deleted} removed), {result.lanes} lanes written in {time.perf_counter() - t0:.2f}s"))
+        if opts['verbosity'] > 1:
+            lanes = (LaneAssignment.objects.filter(heat__event=event).select_related('heat__division', 'athlete')
+                     .order_by('heat__start_time', 'heat_id', 'lane'))
+            for la in lanes:
+                self.stdout.write(f"  {timezone.localtime(la.heat.start_time):%H:%M} {la.heat.division} "
+                                  f"H{la.heat.number} L{la.lane}: {la.athlete}")
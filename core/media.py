@@ -0,0 +1,164 @@
+"""
+Media serving without Django's debug static() view. settings.MEDIA_SERVE picks who sends
+the bytes:
+  'django'      FileResponse (wsgi.file_wrapper → sendfile for whole files), with ETag,
+                Last-Modified, single-range requests and precompressed gzip/brotli variants
+  'x-accel'     nginx: X-Accel-Redirect to MEDIA_ACCEL_PREFIX + path (an `internal` location)
+  'x-sendfile'  Apache/lighttpd mod_xsendfile: X-Sendfile with the absolute path
+With offload, a worker only does a stat and headers. cas/ and derived/ names never change
+content (core.storage, core.images) and are cached for a year; the rest revalidate.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import stat
+from pathlib import Path
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from .storage import CAS_PREFIX, DERIVED_PREFIX
+
+try:
+    import brotli
+except ImportError:  # optional: gzip variants only
+    brotli = None
+
+IMMUTABLE_PREFIXES = (CAS_PREFIX, DERIVED_PREFIX + '/')
+COMPRESSIBLE = ('text/', 'image/svg+xml', 'application/json', 'application/xml', 'application/javascript')
+MIN_COMPRESS_SIZE = 1024
+ENCODED_PREFIX = '.encoded'   # br/gz copies of compressible media, MEDIA_ROOT/.encoded/<path>.gz
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+class FileMeta:
+    __slots__ = ('mtime_ns', 'size', 'etag', 'content_type', 'immutable', 'compressible')
+
+    def __init__(self, path: str, st: os.stat_result):
+        self.mtime_ns, self.size = st.st_mtime_ns, st.st_size
+        self.immutable = path.startswith(IMMUTABLE_PREFIXES)
+        # content-addressed names are their own validator; others use mtime+size like nginx
+        self.etag = f'"{path.split("/", 1)[1].replace("/", "-")}"' if self.immutable else f'"{self.mtime_ns:x}-{self.size:x}"'
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.compressible = self.size >= MIN_COMPRESS_SIZE and self.content_type.startswith(COMPRESSIBLE)
+
+_meta = {}   # path → FileMeta, recomputed only when the file's mtime/size change
+
+def _file_meta(path: str, full: str) -> FileMeta:
+    try:
+        st = os.stat(full)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404
+    meta = _meta.get(path)
+    if meta is None or (meta.mtime_ns, meta.size) != (st.st_mtime_ns, st.st_size):
+        meta = _meta[path] = FileMeta(path, st)
+    return meta
+
+def _encoding(request, meta: FileMeta):
+    """Best precompressible encoding the client accepts for this file, or None."""
+    if not meta.compressible or request.headers.get('Range'):
+        return None
+    accept = request.headers.get('Accept-Encoding', '')
+    if brotli and 'br' in accept:
+        return 'br'
+    return 'gzip' if 'gzip' in accept else None
+
+def _variant(path: str, full: str, meta: FileMeta, encoding: str) -> str:
+    """Path of the br/gzip copy of a file, (re)written on first use after it changes."""
+    suffix, compress = {'br': ('.br', brotli and brotli.compress), 'gzip': ('.gz', gzip.compress)}[encoding]
+    target = Path(settings.MEDIA_ROOT) / ENCODED_PREFIX / (path + suffix)
+    if not target.exists() or target.stat().st_mtime_ns < meta.mtime_ns:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(compress(Path(full).read_bytes()))
+        os.replace(tmp, target)
+    return str(target)
+
+def _range(request, meta: FileMeta):
+    """(start, end) of a satisfiable single range, 'unsatisfiable', or None for the whole file."""
+    header = request.headers.get('Range', '')
+    if not header or request.headers.get('If-Range', meta.etag) != meta.etag:
+        return None
+    m = RANGE_RE.match(header.strip())
+    if not m or not any(m.groups()):
+        return None   # multiple or malformed ranges: send the whole file
+    first, last = m.groups()
+    if first:
+        start, end = int(first), min(int(last), meta.size - 1) if last else meta.size - 1
+    else:
+        start, end = max(0, meta.size - int(last)), meta.size - 1   # suffix: last N bytes
+    if start > end or start >= meta.size:
+        return 'unsatisfiable'
+    return start, end
+
+def _read(f, remaining: int):
+    with f:
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def _offload(path: str, full: str, meta: FileMeta):
+    """Headers-only response for the front server to fill in (it handles Range/304 itself)."""
+    response = HttpResponse(content_type=meta.content_type)
+    if settings.MEDIA_SERVE == 'x-accel':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+    else:
+        response['X-Sendfile'] = full
+    return response
+
+def _send(request, path: str, full: str, meta: FileMeta):
+    encoding = _encoding(request, meta)
+    # each representation needs its own strong validator
+    etag = f'{meta.etag[:-1]}-{encoding}"' if encoding else meta.etag
+    response = get_conditional_response(request, etag=etag, last_modified=meta.mtime_ns // 10**9)
+    if response is None:
+        rng = _range(request, meta)
+        if rng == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{meta.size}"
+        elif rng:
+            start, end = rng
+            f = open(full, 'rb')
+            f.seek(start)
+            response = StreamingHttpResponse(_read(f, end - start + 1), status=206, content_type=meta.content_type)
+            response['Content-Range'] = f"bytes {start}-{end}/{meta.size}"
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            # FileResponse hands whole files to wsgi.file_wrapper (sendfile under gunicorn)
+            response = FileResponse(open(_variant(path, full, meta, encoding) if encoding else full, 'rb'),
+                                    content_type=meta.content_type, filename=os.path.basename(path))
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(meta.mtime_ns // 10**9)
+    return response
+
+@require_safe
+def serve(request, path):
+    try:
+        full = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    meta = _file_meta(path, full)
+    if settings.MEDIA_SERVE in ('x-accel', 'x-sendfile'):
+        response = _offload(path, full, meta)
+    else:
+        response = _send(request, path, full, meta)
+    if meta.immutable:
+        patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_MAX_AGE)
+    if meta.compressible:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_eventdivisionspec_gallery_urls_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Standing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('place', models.PositiveIntegerField()),
+                ('points', models.IntegerField(default=0)),
+                ('display', models.CharField(blank=True, max_length=40)),
+                ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.athlete')),
+                ('division', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='core.division')),
+                ('part', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.eventpart')),
+            ],
+            options={
+                'ordering': ['place', 'athlete_id'],
+                'indexes': [models.Index(fields=['division', 'part', 'place'], name='core_standi_divisio_702b37_idx')],
+                'unique_together': {('division', 'part', 'athlete')},
+            },
+        ),
+    ]
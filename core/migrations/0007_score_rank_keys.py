@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:04
+
+from django.db import migrations, models
+
+
+def rank_key(scoring, s):
+    # core.utils.score_rank_key as of this migration: (bucket, value, tiebreak or None)
+    if scoring == 'time_then_reps':
+        if s.finished and s.time_seconds is not None:
+            return 0, s.time_seconds + (s.penalty_seconds or 0), s.tiebreak_seconds
+        if s.reps is not None:
+            return 1, -(s.reps - (s.penalty_reps or 0)), s.tiebreak_seconds
+    elif scoring == 'reps' and s.reps is not None:
+        return 0, -(s.reps - (s.penalty_reps or 0)), s.tiebreak_seconds
+    elif scoring == 'weight' and s.weight is not None:
+        return 0, -s.weight, s.tiebreak_seconds
+    return None, None, None
+
+
+def backfill_rank_keys(apps, schema_editor):
+    Score = apps.get_model('core', 'Score')
+    scores = list(Score.objects.select_related('part'))
+    for s in scores:
+        s.rank_bucket, s.rank_value, s.rank_tiebreak = rank_key(s.part.scoring if s.part_id else None, s)
+    Score.objects.bulk_update(scores, ['rank_bucket', 'rank_value', 'rank_tiebreak'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_standing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='score',
+            name='rank_bucket',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='rank_tiebreak',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='rank_value',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='score',
+            index=models.Index(fields=['part', 'rank_bucket', 'rank_value', 'rank_tiebreak'], name='core_score_part_id_ff5394_idx'),
+        ),
+        migrations.RunPython(backfill_rank_keys, migrations.RunPython.noop),
+    ]
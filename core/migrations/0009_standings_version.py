@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StandingsVersion',
+            fields=[
+                ('division', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='standings_version', serialize=False, to='core.division')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('reset_version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='standing',
+            name='created_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='standing',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
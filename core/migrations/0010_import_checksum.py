@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_standings_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportChecksum',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=40)),
+                ('key', models.CharField(blank=True, max_length=120)),
+                ('digest', models.CharField(max_length=40)),
+            ],
+            options={
+                'unique_together': {('source', 'key')},
+            },
+        ),
+    ]
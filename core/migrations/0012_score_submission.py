@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_media_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreSubmission',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('result', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('score', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.score')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_score_submission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='score',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
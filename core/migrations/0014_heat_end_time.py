@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:36
+
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def backfill_end_time(apps, schema_editor):
+    # same rule as core.models.heat_caps, on the historical models
+    Event = apps.get_model('core', 'Event')
+    EventPart = apps.get_model('core', 'EventPart')
+    EventDivisionSpec = apps.get_model('core', 'EventDivisionSpec')
+    Heat = apps.get_model('core', 'Heat')
+    caps = {(e_id, None): cap for e_id, cap in Event.objects.values_list('pk', 'cap_seconds')}
+    parts = {}
+    for p_id, e_id in EventPart.objects.values_list('pk', 'event_id'):
+        parts.setdefault(e_id, []).append(p_id)
+    overrides = {}
+    for p_id, e_id, d_id, cap in (EventDivisionSpec.objects.filter(cap_seconds__isnull=False)
+                                  .values_list('part_id', 'part__event_id', 'division_id', 'cap_seconds')):
+        overrides.setdefault((e_id, d_id), {})[p_id] = cap
+    for (e_id, d_id), by_part in overrides.items():
+        share = caps[e_id, None] / len(parts[e_id])
+        caps[e_id, d_id] = round(sum(by_part.get(p, share) for p in parts[e_id]))
+    heats = list(Heat.objects.all())
+    for h in heats:
+        cap = caps.get((h.event_id, h.division_id), caps.get((h.event_id, None), 0))
+        h.end_time = h.start_time + timedelta(seconds=cap)
+    Heat.objects.bulk_update(heats, ['end_time'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_score_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='heat',
+            name='end_time',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_end_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='heat',
+            name='end_time',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='heat',
+            index=models.Index(fields=['start_time', 'end_time'], name='core_heat_start_t_697c6a_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_heat_end_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='eventdivisionspec',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
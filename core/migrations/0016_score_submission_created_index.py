@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_description_html'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scoresubmission',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
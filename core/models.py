@@ -1,6 +1,15 @@
 from django.db import models
+from django.db.models import ExpressionWrapper, F
+from django.utils import timezone
 from django.contrib.auth.models import User
 from datetime import timedelta
+from .utils import NO_TIEBREAK, render_markdown, score_rank_key
+
+def _render_description(obj, save_kwargs) -> None:
+    """Keep description_html in step with description_md; pages output it without parsing."""
+    obj.description_html = render_markdown(obj.description_md)
+    if save_kwargs.get('update_fields') is not None:
+        save_kwargs['update_fields'] = {*save_kwargs['update_fields'], 'description_html'}
 
 class EventPart(models.Model):
     SCORING_CHOICES = (
@@ -33,14 +42,20 @@ class EventDivisionSpec(models.Model):
     cap_seconds = models.PositiveIntegerField(null=True, blank=True)  # override if needed
     tiebreak_label = models.CharField(max_length=120, blank=True)     # e.g., "30 air squats finished time"
     description_md = models.TextField(blank=True)                     # full standards for this division/sex
+    description_html = models.TextField(blank=True, editable=False)   # render_markdown(description_md), set on save
     poster = models.ImageField(upload_to='events/', blank=True)  # main poster for this división/part
     gallery_urls = models.TextField(blank=True, help_text="Una URL por línea (opcional)")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ('part', 'division')
 
     def __str__(self):
         return f"{self.part} · {self.division.display_name}"
+
+    def save(self, *args, **kwargs):
+        _render_description(self, kwargs)
+        super().save(*args, **kwargs)
     
 class Division(models.Model):
     SEX_CHOICES = (('M','Masculino'), ('F','Femenino'))
@@ -75,22 +90,76 @@ class Event(models.Model):
     cap_seconds = models.PositiveIntegerField(default=0)
     tiebreak_enabled = models.BooleanField(default=False)
     description_md = models.TextField(blank=True)   # WOD + estándares (Markdown)
+    description_html = models.TextField(blank=True, editable=False)   # render_markdown(description_md), set on save
     media_urls = models.TextField(blank=True)       # optional: 1 per line
     class Meta: ordering = ['number']
     def __str__(self): return f"E{self.number} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        _render_description(self, kwargs)
+        super().save(*args, **kwargs)
+
+def heat_caps(event_ids=None) -> dict:
+    """
+    Heat length in seconds per (event_id, division_id) for divisions with cap overrides
+    (EventDivisionSpec) on the event's parts, which run back to back: the overrides plus an
+    even share of the event cap for each part without one, so shorter (scaled) parts give
+    a shorter heat. Other divisions use the event cap, under (event_id, None). Three queries.
+    """
+    events = Event.objects.all() if event_ids is None else Event.objects.filter(pk__in=event_ids)
+    caps = {(e_id, None): cap for e_id, cap in events.values_list('pk', 'cap_seconds')}
+    parts = {}   # event_id → [part ids]
+    for p_id, e_id in EventPart.objects.filter(event_id__in=[e for e, _ in caps]).values_list('pk', 'event_id'):
+        parts.setdefault(e_id, []).append(p_id)
+    overrides = {}   # (event_id, division_id) → {part_id: cap}
+    specs = EventDivisionSpec.objects.filter(part__event_id__in=list(parts), cap_seconds__isnull=False)
+    for p_id, e_id, d_id, cap in specs.values_list('part_id', 'part__event_id', 'division_id', 'cap_seconds'):
+        overrides.setdefault((e_id, d_id), {})[p_id] = cap
+    for (e_id, d_id), by_part in overrides.items():
+        share = caps[e_id, None] / len(parts[e_id])
+        caps[e_id, d_id] = round(sum(by_part.get(p, share) for p in parts[e_id]))
+    return caps
+
+def refresh_heat_end_times(event_ids=None) -> int:
+    """
+    Recompute Heat.end_time in SQL after caps or start times changed in bulk (no save()):
+    one UPDATE per event and per division with overrides. Returns rows changed.
+    """
+    now, changed = timezone.now(), 0
+    caps = heat_caps(event_ids)
+    for (e_id, d_id), cap in caps.items():
+        end = ExpressionWrapper(F('start_time') + timedelta(seconds=cap), output_field=models.DateTimeField())
+        qs = Heat.objects.filter(event_id=e_id)
+        if d_id is None:
+            qs = qs.exclude(division_id__in=[d for e, d in caps if e == e_id and d is not None])
+        else:
+            qs = qs.filter(division_id=d_id)
+        changed += qs.exclude(end_time=end).update(end_time=end, updated_at=now)
+    return changed
+
 class Heat(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
     division = models.ForeignKey(Division, on_delete=models.PROTECT)
     number = models.PositiveSmallIntegerField()     # Heat 1, 2…
     start_time = models.DateTimeField()
+    # start_time + heat_caps(); kept in sync by save(), core.signals and bulk writers
+    # (refresh_heat_end_times) so "what's on now" is an indexed range query
+    end_time = models.DateTimeField(editable=False)
     lane_count = models.PositiveSmallIntegerField(default=8)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     class Meta:
         unique_together = ('event','division','number')
         ordering = ['start_time']
+        indexes = [models.Index(fields=['start_time', 'end_time'])]
     def __str__(self): return f"{self.event} {self.division} H{self.number}"
-    def end_time(self):
-        return self.start_time + timedelta(seconds=self.event.cap_seconds or 0)
+
+    def save(self, *args, **kwargs):
+        caps = heat_caps([self.event_id])
+        cap = caps.get((self.event_id, self.division_id), caps.get((self.event_id, None), 0))
+        self.end_time = self.start_time + timedelta(seconds=cap)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'end_time'}
+        super().save(*args, **kwargs)
 
 class LaneAssignment(models.Model):
     heat = models.ForeignKey(Heat, on_delete=models.CASCADE, related_name='lanes')
@@ -119,12 +188,120 @@ class Score(models.Model):
     notes = models.CharField(max_length=200, blank=True)
     status = models.CharField(max_length=10, choices=STATUS, default='approved')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # bumped by every write from core.scoring / ScoreAdmin, which only update the row if it
+    # still has the version the writer loaded (compare-and-swap, no locks)
+    version = models.PositiveIntegerField(default=0)
+
+    # Derived sort key (core.utils.score_rank_key), kept in sync on save so the DB can rank.
+    # NULL bucket = nothing to rank yet; NULL tiebreak sorts last.
+    rank_bucket = models.SmallIntegerField(null=True, blank=True, editable=False)
+    rank_value = models.FloatField(null=True, blank=True, editable=False)
+    rank_tiebreak = models.FloatField(null=True, blank=True, editable=False)
+
+    RANK_FIELDS = ('rank_bucket', 'rank_value', 'rank_tiebreak')
 
     class Meta:
         unique_together = ('part', 'athlete')
+        indexes = [models.Index(fields=['part', 'rank_bucket', 'rank_value', 'rank_tiebreak'])]
 
     def __str__(self):
         return f"{self.athlete} · {self.part}"
+
+    def set_rank_keys(self, scoring=None):
+        """Recompute rank_* from the primitives. Call before bulk_create/bulk_update."""
+        if scoring is None:
+            scoring = self.part.scoring if self.part_id else None
+        key = score_rank_key(scoring, self) if scoring else None
+        if key is None:
+            self.rank_bucket = self.rank_value = self.rank_tiebreak = None
+        else:
+            self.rank_bucket, self.rank_value = key[0], key[1]
+            self.rank_tiebreak = None if key[2] == NO_TIEBREAK else key[2]
+
+    def save(self, *args, **kwargs):
+        self.set_rank_keys()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], *self.RANK_FIELDS}
+        super().save(*args, **kwargs)
+
+class ScoreSubmission(models.Model):
+    """
+    Idempotency key of an applied batch score record (core.scoring) and the result it got,
+    so a judge's client retrying after a lost response gets the same answer, not a re-apply.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    score = models.ForeignKey(Score, on_delete=models.SET_NULL, null=True, blank=True)
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)   # retention prune
+
+    def __str__(self):
+        return self.key
+
+class Standing(models.Model):
+    """
+    Materialized leaderboard row, maintained by core.standings whenever a Score changes.
+    part set → place/points on that part; part NULL → overall total for the division.
+    """
+    division = models.ForeignKey(Division, on_delete=models.CASCADE, related_name='standings')
+    part = models.ForeignKey(EventPart, on_delete=models.CASCADE, null=True, blank=True)
+    athlete = models.ForeignKey(Athlete, on_delete=models.CASCADE)
+    place = models.PositiveIntegerField()
+    points = models.IntegerField(default=0)
+    display = models.CharField(max_length=40, blank=True)  # score cell for per-part rows
+    # StandingsVersion.version when this row last changed / first appeared (row-level diffs)
+    version = models.PositiveBigIntegerField(default=0)
+    created_version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('division', 'part', 'athlete')
+        indexes = [models.Index(fields=['division', 'part', 'place'])]
+        ordering = ['place', 'athlete_id']
+
+    def __str__(self):
+        return f"{self.division} · {self.part or 'General'} · P{self.place} {self.athlete}"
+
+class StandingsVersion(models.Model):
+    """
+    Per-division counter bumped by every standings refresh. Clients that saw version N
+    fetch only rows with Standing.version > N, unless rows were removed after N
+    (reset_version > N), in which case they need the whole table again.
+    """
+    division = models.OneToOneField(Division, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='standings_version')
+    version = models.PositiveBigIntegerField(default=0)
+    reset_version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.division} v{self.version}"
+
+class ImportChecksum(models.Model):
+    """
+    Content hash of what import_competition last applied: one row per CSV file (key '')
+    and one per row key (bib, event number, heat key…). Unchanged files/rows are skipped.
+    """
+    source = models.CharField(max_length=40)   # CSV file name
+    key = models.CharField(max_length=120, blank=True)
+    digest = models.CharField(max_length=40)
+
+    class Meta:
+        unique_together = ('source', 'key')
+
+    def __str__(self):
+        return f"{self.source}:{self.key or '*'}"
+
+class MediaBlob(models.Model):
+    """
+    A file in content-addressed storage (core.storage) and how many model file fields
+    point at it. Kept up to date by core.signals; the file goes when refs reaches 0.
+    """
+    name = models.CharField(max_length=100, primary_key=True)   # cas/ab/ab12….png
+    size = models.PositiveBigIntegerField(default=0)
+    refs = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ×{self.refs}"
+
 class Announcement(models.Model):
     title = models.CharField(max_length=120)
     body = models.TextField()
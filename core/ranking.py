@@ -0,0 +1,191 @@
+"""
+The single ranking engine. Everything that needs places or points goes through
+rank_division(): core.standings materializes its output into Standing, which the
+leaderboard, my_day and seeding read. settings.RANKING_BACKEND picks how it ranks;
+athlete_place() ranks one athlete on one part in the database.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Case, F, IntegerField, QuerySet, Value, When, Window
+from django.db.models.functions import Greatest, Rank
+from .models import Score, EventPart, Division, Athlete
+from .utils import NO_TIEBREAK, standard_competition_points, score_rank_key, score_display
+
+try:  # optional: only the 'numpy' backend needs it
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+class PartRow(NamedTuple):
+    athlete: Athlete
+    place: int
+    points: int
+    display: str
+    score: Score
+
+class OverallRow(NamedTuple):
+    athlete: Athlete
+    place: int
+    points: int
+    by_part: Dict[int, dict]   # part_id → {'place': p, 'points': pts}
+
+class DivisionRanking(NamedTuple):
+    parts: Dict[int, List[PartRow]]   # part_id → rows in place order
+    overall: List[OverallRow]
+
+def competition_places(keys: List) -> List[int]:
+    """Standard competition ranking (1,1,3,…) for keys already in sorted order."""
+    places = []
+    for i, k in enumerate(keys):
+        places.append(i + 1 if i == 0 or k != keys[i - 1] else places[-1])
+    return places
+
+BACKENDS = ('python', 'numpy', 'sql')
+
+def rank_division(division: Division, parts: Optional[Iterable[EventPart]] = None,
+                  backend: str = 'python') -> DivisionRanking:
+    """
+    Rank every part of a division from ONE Score query (approved scores of active athletes).
+    Ties share place and points; athletes tied on every key keep athlete id order.
+    Overall = sum of points over counting parts; athletes with 0 total are left out.
+    backend: 'python' (default), 'numpy' (columnar, for very large divisions) or 'sql'
+    (RANK() over the stored Score.rank_* keys); all three give the same results.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ranking backend {backend!r}; expected one of {BACKENDS}")
+
+    parts = list(EventPart.objects.all()) if parts is None else list(parts)
+    part_by_id = {p.id: p for p in parts}
+    scores = (Score.objects
+              .filter(part__in=list(part_by_id), athlete__division=division,
+                      athlete__is_active=True, status='approved')
+              .select_related('athlete'))
+
+    if backend == 'sql':
+        ranked = defaultdict(list)
+        for s in _with_sql_rank(scores.filter(rank_bucket__isnull=False)).order_by('part_id', 'place', 'athlete_id'):
+            ranked[s.part_id].append((s, s.place, s.points))
+    else:
+        rank_part = _rank_part_numpy if backend == 'numpy' else _rank_part_python
+        grouped = defaultdict(list)
+        for s in scores.order_by('athlete_id'):
+            grouped[s.part_id].append(s)
+        ranked = {p.id: rank_part(p, grouped.get(p.id, [])) for p in parts}
+
+    by_part: Dict[int, List[PartRow]] = {}
+    totals: Dict[int, int] = defaultdict(int)
+    athletes: Dict[int, Athlete] = {}
+    per_athlete: Dict[int, Dict[int, dict]] = defaultdict(dict)
+    for part in parts:
+        rows = []
+        for s, place, pts in ranked.get(part.id, []):
+            rows.append(PartRow(s.athlete, place, pts, score_display(part.scoring, s), s))
+            athletes[s.athlete_id] = s.athlete
+            per_athlete[s.athlete_id][part.id] = {'place': place, 'points': pts}
+            totals[s.athlete_id] += pts
+        by_part[part.id] = rows
+
+    return DivisionRanking(by_part, [
+        OverallRow(athletes[aid], place, total, per_athlete[aid])
+        for (aid, total), place in overall_places(totals)
+    ])
+
+def _with_sql_rank(qs: QuerySet) -> QuerySet:
+    """
+    Annotate place (RANK() per part over the stored key) and points. Works on SQLite and
+    Postgres; rows without a rank key must already be filtered out.
+    Points mirror core.utils.standard_competition_points: max(0, 100 - 4*(place-1)).
+    """
+    place = Window(
+        expression=Rank(),
+        partition_by=[F('part_id')],
+        order_by=[F('rank_bucket').asc(), F('rank_value').asc(), F('rank_tiebreak').asc(nulls_last=True)],
+    )
+    return qs.annotate(place=place).annotate(points=Case(
+        When(part__counts_as_event=True, then=Greatest(Value(0), Value(104) - Value(4) * F('place'))),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+def athlete_place(athlete: Athlete, part: EventPart) -> Optional[Tuple[int, int]]:
+    """
+    (place, points) of one athlete on one part, ranked inside the database against the
+    rest of their division over the stored Score.rank_* keys; None if they have nothing
+    ranked. Only one row comes back, for lookups that can't wait for the Standing refresh.
+    """
+    inner = _with_sql_rank(Score.objects.filter(
+        part=part, athlete__division_id=athlete.division_id, athlete__is_active=True,
+        status='approved', rank_bucket__isnull=False,
+    )).values('athlete_id', 'place', 'points')
+    sql, params = inner.query.sql_with_params()
+    # the athlete filter must apply AFTER the window, hence the derived table
+    with connection.cursor() as cur:
+        cur.execute(f"SELECT place, points FROM ({sql}) ranked WHERE athlete_id = %s", [*params, athlete.id])
+        row = cur.fetchone()
+    return (row[0], row[1]) if row else None
+
+def _rank_part_python(part: EventPart, scores: List[Score]) -> List[Tuple[Score, int, int]]:
+    """[(score, place, points)] in place order; scores with nothing to rank are dropped."""
+    keyed = [(k, s) for s in scores if (k := score_rank_key(part.scoring, s)) is not None]
+    keyed.sort(key=lambda e: e[0])
+    places = competition_places([k for k, _ in keyed])
+    return [
+        (s, place, standard_competition_points(place) if part.counts_as_event else 0)
+        for (_, s), place in zip(keyed, places)
+    ]
+
+def _rank_part_numpy(part: EventPart, scores: List[Score]) -> List[Tuple[Score, int, int]]:
+    """
+    Columnar twin of _rank_part_python: primitives go into arrays, the key is built with
+    one np.where per part, ordering is a single lexsort and tied places are filled in bulk.
+    """
+    if np is None:
+        raise ImproperlyConfigured("The 'numpy' ranking backend requires numpy to be installed.")
+    n = len(scores)
+    if not n:
+        return []
+
+    def col(attr, missing=np.nan):
+        return np.fromiter((missing if (v := getattr(s, attr)) is None else v for s in scores), float, n)
+
+    time, reps, weight = col('time_seconds'), col('reps'), col('weight')
+    pen_sec, pen_reps = col('penalty_seconds', 0.0), col('penalty_reps', 0.0)
+    tiebreak = col('tiebreak_seconds', NO_TIEBREAK)
+    finished = np.fromiter((s.finished for s in scores), bool, n) & ~np.isnan(time)
+
+    bucket = np.zeros(n)
+    if part.scoring == 'time_then_reps':
+        valid = finished | ~np.isnan(reps)
+        bucket = np.where(finished, 0.0, 1.0)
+        primary = np.where(finished, time + pen_sec, -(reps - pen_reps))
+    elif part.scoring == 'reps':
+        valid = ~np.isnan(reps)
+        primary = -(reps - pen_reps)
+    elif part.scoring == 'weight':
+        valid = ~np.isnan(weight)
+        primary = -weight
+    else:
+        return []
+
+    idx = np.flatnonzero(valid)
+    if not idx.size:
+        return []
+    # lexsort: last key is primary; the input index keeps athlete id order among full ties
+    order = idx[np.lexsort((idx, tiebreak[idx], primary[idx], bucket[idx]))]
+    b, p, t = bucket[order], primary[order], tiebreak[order]
+    new_key = np.ones(order.size, bool)
+    new_key[1:] = (b[1:] != b[:-1]) | (p[1:] != p[:-1]) | (t[1:] != t[:-1])
+    places = np.maximum.accumulate(np.where(new_key, np.arange(1, order.size + 1), 0))
+    if part.counts_as_event:
+        table = np.array([standard_competition_points(pl) for pl in range(1, order.size + 1)])
+        points = table[places - 1]
+    else:
+        points = np.zeros(order.size, int)
+    return [(scores[i], int(pl), int(pt)) for i, pl, pt in zip(order.tolist(), places.tolist(), points.tolist())]
+
+def overall_places(totals: Dict[int, int]):
+    """[((athlete_id, total), place)] by total DESC then athlete id; 0 totals dropped."""
+    ordered = sorted(((aid, t) for aid, t in totals.items() if t > 0), key=lambda r: (-r[1], r[0]))
+    return list(zip(ordered, competition_places([t for _, t in ordered])))
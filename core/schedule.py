@@ -0,0 +1,147 @@
+"""
+Schedule shifts for when the floor runs late. shift_from() moves a heat and everything
+after it (every division of the event, optionally the later events too) with one UPDATE
+in a transaction, instead of a save() per heat, and reports the lane and athlete clashes
+the move creates with heats that stayed put. Only SCHEDULE pages are invalidated.
+
+seed_heats() lays out an event (the final) from the overall standings (built first for a
+division that never was): per division, heats of lane_count ranked from the bottom up so
+the leaders race last, best seeds of each heat in the center lanes. It diffs against the
+stored heats/lanes, so re-running it with unchanged standings writes nothing.
+"""
+from datetime import timedelta
+from typing import Iterable, List, NamedTuple, Optional
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Athlete, Division, Event, Heat, LaneAssignment, Standing, heat_caps
+from . import caching, standings
+
+class Clash(NamedTuple):
+    moved: Heat     # shifted heat
+    other: Heat     # heat that didn't move and now overlaps it
+    lanes: list     # lane numbers both use
+    athletes: list  # Athlete objects in both
+
+def _later(heat: Heat, later_events: bool):
+    later = Q(event_id=heat.event_id, start_time__gte=heat.start_time)
+    if later_events:
+        later |= Q(event__number__gt=heat.event.number)
+    return Heat.objects.filter(later)
+
+def shift_from(heat: Heat, minutes: int, later_events: bool = False):
+    """Move `heat` and the heats after it by `minutes` (negative pulls them forward).
+    Returns (heats moved, [Clash])."""
+    delta = timedelta(minutes=minutes)
+    with transaction.atomic():
+        qs = _later(heat, later_events)
+        moved = list(qs.values_list('pk', flat=True))
+        # end_time is start_time + cap, so it moves by the same delta
+        qs.update(start_time=F('start_time') + delta, end_time=F('end_time') + delta,
+                  updated_at=timezone.now())
+        clashes = _clashes(moved, delta)
+        # update() sends no signals: invalidate the schedule pages by hand
+        transaction.on_commit(lambda: caching.bump(caching.SCHEDULE))
+    return len(moved), clashes
+
+def _clashes(moved: List[int], delta: timedelta) -> List[Clash]:
+    """Moved/unmoved heat pairs that overlap now but didn't before and share a lane or athlete."""
+    if not moved:
+        return []
+    heats = {h.pk: h for h in Heat.objects.filter(pk__in=moved).select_related('event', 'division')}
+    lo, hi = min(h.start_time for h in heats.values()), max(h.end_time for h in heats.values())
+    others = {h.pk: h for h in Heat.objects.filter(start_time__lt=hi, end_time__gt=lo)
+              .exclude(pk__in=moved).select_related('event', 'division')}
+    if not others:
+        return []
+    lanes = {}   # heat id → {lane: athlete}
+    for la in LaneAssignment.objects.filter(heat_id__in=[*heats, *others]).select_related('athlete'):
+        lanes.setdefault(la.heat_id, {})[la.lane] = la.athlete
+
+    def overlap(a_start, a_end, b):
+        return a_start < b.end_time and b.start_time < a_end
+
+    clashes = []
+    for h in sorted(heats.values(), key=lambda h: (h.start_time, h.pk)):
+        mine = lanes.get(h.pk, {})
+        for o in sorted(others.values(), key=lambda o: (o.start_time, o.pk)):
+            if not overlap(h.start_time, h.end_time, o) or overlap(h.start_time - delta, h.end_time - delta, o):
+                continue
+            theirs = lanes.get(o.pk, {})
+            shared_lanes = sorted(mine.keys() & theirs.keys())
+            ids = {a.pk for a in theirs.values()}
+            shared = sorted({a.pk: a for a in mine.values() if a.pk in ids}.values(), key=lambda a: a.bib)
+            if shared_lanes or shared:
+                clashes.append(Clash(h, o, shared_lanes, shared))
+    return clashes
+
+def center_out(lane_count: int) -> List[int]:
+    """Lanes best seed first: 8 → [4, 5, 3, 6, 2, 7, 1, 8]."""
+    return sorted(range(1, lane_count + 1), key=lambda lane: (abs(2 * lane - lane_count - 1), lane))
+
+def seeded(division: Division) -> List[Athlete]:
+    """Active athletes best first: overall place, then the unranked by bib. A division whose
+    standings were never materialized is built first rather than seeded by bib."""
+    standings.ensure_built(division)
+    places = dict(Standing.objects.filter(division=division, part__isnull=True)
+                  .values_list('athlete_id', 'place'))
+    athletes = Athlete.objects.filter(division=division, is_active=True)
+    return sorted(athletes, key=lambda a: (a.pk not in places, places.get(a.pk, 0), a.bib))
+
+class Seeding(NamedTuple):
+    heats: int        # heats laid out
+    created: int      # Heat rows inserted
+    moved: int        # Heat rows whose start/lanes changed
+    deleted: int      # Heat rows no longer needed
+    lanes: int        # LaneAssignment rows rewritten
+
+def seed_heats(event: Event, start, divisions: Optional[Iterable[Division]] = None,
+               lane_count: int = 8, changeover: int = 5) -> Seeding:
+    """
+    Heats for `event` from the current overall standings, division by division in
+    sort_order, each heat starting when the previous one's cap plus `changeover` minutes
+    is over. Divisions without athletes get no heats. One transaction.
+    """
+    divisions = list(divisions if divisions is not None else Division.objects.all())
+    caps = heat_caps([event.pk])
+    layout = {}   # (division_id, number) → (start_time, end_time, {lane: athlete_id})
+    t = start
+    for d in divisions:
+        ranked = seeded(d)
+        cap = timedelta(seconds=caps.get((event.pk, d.pk), caps.get((event.pk, None), 0)))
+        # top lane_count in the last heat; the first heat takes the remainder
+        chunks = [ranked[i:i + lane_count] for i in range(0, len(ranked), lane_count)][::-1]
+        for number, chunk in enumerate(chunks, start=1):
+            layout[(d.pk, number)] = (t, t + cap, {lane: a.pk for lane, a in zip(center_out(lane_count), chunk)})
+            t += cap + timedelta(minutes=changeover)
+
+    with transaction.atomic():
+        existing = {(h.division_id, h.number): h for h in
+                    Heat.objects.filter(event=event, division__in=divisions).select_for_update()}
+        stale = [h.pk for key, h in existing.items() if key not in layout]
+        changed, new = [], []
+        for (d_id, number), (begin, end, _) in layout.items():
+            h = existing.get((d_id, number))
+            if h is None:
+                new.append(Heat(event=event, division_id=d_id, number=number, start_time=begin,
+                                end_time=end, lane_count=lane_count))
+            elif (h.start_time, h.end_time, h.lane_count) != (begin, end, lane_count):
+                h.start_time, h.end_time, h.lane_count = begin, end, lane_count
+                changed.append(h)
+        now = timezone.now()
+        for h in changed:
+            h.updated_at = now
+        # bulk writes skip Heat.save(): end_time is set above from the same heat_caps()
+        Heat.objects.bulk_update(changed, ['start_time', 'end_time', 'lane_count', 'updated_at'], batch_size=500)
+        Heat.objects.bulk_create(new, batch_size=500)
+        heat_ids = {(h.division_id, h.number): h.pk for h in [*existing.values(), *new]}
+
+        wanted = {(heat_ids[key], lane, a_id) for key, (_, _, lanes) in layout.items() for lane, a_id in lanes.items()}
+        have = {(la.heat_id, la.lane, la.athlete_id): la.pk for la in
+                LaneAssignment.objects.filter(heat_id__in=[*heat_ids.values()]).only('heat_id', 'lane', 'athlete_id')}
+        LaneAssignment.objects.filter(pk__in=[pk for row, pk in have.items() if row not in wanted]).delete()
+        Heat.objects.filter(pk__in=stale).delete()
+        LaneAssignment.objects.bulk_create([LaneAssignment(heat_id=h, lane=lane, athlete_id=a)
+                                            for h, lane, a in wanted - have.keys()], batch_size=500)
+        transaction.on_commit(lambda: caching.bump(caching.SCHEDULE))
+    return Seeding(len(layout), len(new), len(changed), len(stale), len(wanted - have.keys()))
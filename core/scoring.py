@@ -0,0 +1,301 @@
+"""
+Score writes shared by the staff scores page and the batch endpoint judges' devices use
+on flaky Wi-Fi. apply_batch() takes many records at once, each carrying a client
+idempotency key: everything is loaded in a handful of queries, validated in memory,
+upserted in one transaction, and each touched (part, division) is re-ranked once.
+A key that was already applied returns its stored result instead of writing again;
+keys older than settings.SCORE_SUBMISSION_RETENTION_DAYS are pruned as batches come in.
+
+Concurrent writers don't lock: an update only lands if Score.version is still the one
+the writer loaded (compare-and-swap), otherwise that row comes back as a conflict.
+
+With settings.SCORE_MODERATION judges' writes are saved 'pending' and leave the rankings
+alone; approve() releases a heat's worth of them with one UPDATE and one re-rank.
+"""
+import copy
+from datetime import timedelta
+from django import forms
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Athlete, EventPart, Score, ScoreSubmission
+from . import signals
+
+# primitives a judge enters, per EventPart.scoring
+SCORE_FIELDS = {
+    'time_then_reps': ('finished', 'time_seconds', 'reps', 'tiebreak_seconds', 'penalty_seconds', 'penalty_reps', 'notes'),
+    'reps': ('reps', 'penalty_reps', 'notes'),
+    'weight': ('weight', 'notes'),
+}
+MAX_BATCH = 200
+CONFLICT = 'Otro usuario guardó este score mientras editabas.'
+
+_forms = {}
+
+def fields_for(part: EventPart) -> tuple:
+    return SCORE_FIELDS.get(part.scoring, ('notes',))
+
+def _form_class(part: EventPart):
+    fields = fields_for(part)
+    if fields not in _forms:
+        _forms[fields] = forms.modelform_factory(Score, fields=fields)
+    return _forms[fields]
+
+def _values(score: Score) -> dict:
+    return {'version': score.version, **{f: getattr(score, f) for f in fields_for(score.part)}}
+
+class LaneScoreForm(forms.ModelForm):
+    """A row of the staff page; `bib` catches lanes that changed between GET and POST."""
+    bib = forms.CharField(widget=forms.HiddenInput, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['bib'].initial = self.instance.athlete.bib
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get('bib') != self.instance.athlete.bib:
+            raise forms.ValidationError('El heat cambió mientras cargabas; recargá la página.')
+        return cleaned
+
+    def has_changed(self):
+        # a newer version alone isn't an edit: untouched rows are never written
+        return any(f not in ('bib', 'version') for f in self.changed_data)
+
+class LaneScoreFormSet(forms.BaseFormSet):
+    """
+    One form per athlete of a heat, bound to its Score or to an unsaved placeholder, so
+    showing the page never writes. save() creates only the placeholders a judge filled in.
+    """
+    def __init__(self, data=None, *, scores, **kwargs):
+        self.scores = scores   # part and athlete already set on each (no lazy loads)
+        super().__init__(data, initial=[{} for _ in scores], **kwargs)
+
+    def total_form_count(self):
+        return min(super().total_form_count(), len(self.scores))
+
+    def get_form_kwargs(self, index):
+        return {**super().get_form_kwargs(index), 'instance': self.scores[index]}
+
+    def save(self) -> bool:
+        """
+        Write the rows that changed. False if some were saved by someone else meanwhile:
+        those forms get an error and the current version, so saving again overwrites knowingly.
+        """
+        changed = {id(f.instance): f for f in self.forms if f.has_changed()}
+        scores = [f.instance for f in changed.values()]
+        conflicts = save_scores([s for s in scores if s.pk is None], [s for s in scores if s.pk is not None])
+        if not conflicts:
+            return True
+        current = _current(conflicts)
+        for s in conflicts:
+            form, now = changed[id(s)], current.get((s.part_id, s.athlete_id))
+            shown = ', '.join(f"{form.fields[f].label}: {v}" for f, v in _values(now).items()
+                              if f in form.fields and f != 'version' and v not in (None, '')) if now else ''
+            form.add_error(None, f"{CONFLICT} Ahora: {shown or 'vacío'}. Guardá de nuevo para sobrescribir.")
+            form.data = form.data.copy()
+            form.data[form.add_prefix('version')] = now.version if now else 0
+        return False
+
+def lane_formset(part: EventPart):
+    key = ('lanes', fields_for(part))
+    if key not in _forms:
+        form = forms.modelform_factory(Score, form=LaneScoreForm, fields=(*fields_for(part), 'version'),
+                                       widgets={'version': forms.HiddenInput})
+        _forms[key] = forms.formset_factory(form, formset=LaneScoreFormSet, extra=0)
+    return _forms[key]
+
+def _current(scores: list) -> dict:
+    """(part_id, athlete_id) → Score as stored now, with part/athlete taken from `scores`."""
+    found = {(s.part_id, s.athlete_id): s for s in Score.objects.filter(
+        Q(*[Q(part_id=s.part_id, athlete_id=s.athlete_id) for s in scores], _connector=Q.OR))}
+    for s in scores:
+        if (s.part_id, s.athlete_id) in found:
+            found[s.part_id, s.athlete_id].part, found[s.part_id, s.athlete_id].athlete = s.part, s.athlete
+    return found
+
+def _insert(created: list) -> list:
+    """bulk_create; the rows someone else created first (unique part+athlete) are conflicts."""
+    try:
+        with transaction.atomic():
+            Score.objects.bulk_create(created)
+        return []
+    except IntegrityError:
+        pass
+    conflicts = []
+    for s in created:   # rare: find which rows lost, the rest still land
+        try:
+            with transaction.atomic():
+                Score.objects.bulk_create([s])
+        except IntegrityError:
+            conflicts.append(s)
+    return conflicts
+
+def _update(updated: list) -> list:
+    """Compare-and-swap bulk_update: a row is written only if its version is unchanged."""
+    expected = {s.pk: s.version for s in updated}
+    now = timezone.now()
+    for s in updated:
+        s.version, s.updated_at = s.version + 1, now   # bulk_update skips auto_now
+    fields = [*{f for s in updated for f in fields_for(s.part)}, *Score.RANK_FIELDS, 'status', 'updated_at', 'version']
+    with transaction.atomic():
+        written = Score.objects.filter(_at_versions(expected)).bulk_update(updated, fields)
+        if written == len(updated):
+            return []
+        transaction.set_rollback(True)
+    conflicts = []
+    for s in updated:   # some row moved on: write the others one by one
+        if not Score.objects.filter(pk=s.pk, version=expected[s.pk]).update(**{f: getattr(s, f) for f in fields}):
+            s.version = expected[s.pk]
+            conflicts.append(s)
+    return conflicts
+
+def save_scores(created: list, updated: list) -> list:
+    """
+    Write validated scores (part and athlete loaded) with bulk queries in one transaction;
+    returns the ones that lost a race and weren't written. post_save doesn't fire, so
+    each touched (part, division) is queued for one re-rank here, unless nothing written
+    was or is approved (moderation: pending scores aren't ranked).
+    """
+    scores = [*created, *updated]
+    if not scores:
+        return []
+    ranked = {id(s) for s in updated if s.status == 'approved'}
+    for s in scores:
+        s.set_rank_keys(s.part.scoring)
+        if settings.SCORE_MODERATION:
+            s.status = 'pending'
+        if s.status == 'approved':
+            ranked.add(id(s))
+    with transaction.atomic():
+        conflicts = (_insert(created) if created else []) + (_update(updated) if updated else [])
+        lost = {id(s) for s in conflicts}
+        for part_id, division_id in {(s.part_id, s.athlete.division_id) for s in scores
+                                     if id(s) in ranked and id(s) not in lost}:
+            signals.schedule_refresh(part_id, division_id)
+    return conflicts
+
+def _at_versions(seen: dict) -> Q:
+    return Q(*[Q(pk=pk, version=v) for pk, v in seen.items()], _connector=Q.OR)
+
+def approve(seen: dict) -> set:
+    """
+    Approve pending scores {pk: version the head judge saw} with one UPDATE. A score edited
+    since then (other version) stays pending. Returns the approved pks; each affected
+    (part, division) is re-ranked once after commit.
+    """
+    if not seen:
+        return set()
+    with transaction.atomic():
+        # rows locked first: a re-sent approval finds nothing pending and reports nothing
+        done = list(Score.objects.select_for_update(of=('self',)).filter(_at_versions(seen), status='pending')
+                    .values_list('pk', 'part_id', 'athlete__division_id'))
+        Score.objects.filter(pk__in=[pk for pk, _, _ in done]).update(
+            status='approved', version=F('version') + 1, updated_at=timezone.now())
+        for part_id, division_id in {(part_id, division_id) for _, part_id, division_id in done}:
+            signals.schedule_refresh(part_id, division_id)
+    return {pk for pk, _, _ in done}
+
+def prune_submissions() -> int:
+    """Forget idempotency keys past the retention window; returns how many were deleted."""
+    cutoff = timezone.now() - timedelta(days=settings.SCORE_SUBMISSION_RETENTION_DAYS)
+    return ScoreSubmission.objects.filter(created_at__lt=cutoff).delete()[0]
+
+def _result(key, record, ok, **extra):
+    return {'key': key, 'part': record.get('part'), 'bib': record.get('bib'), 'ok': ok, **extra}
+
+def _conflict(key, record, now):
+    return _result(key, record, False, conflict=True, errors={'version': [CONFLICT]},
+                   current=_values(now) if now else None)
+
+def apply_batch(records: list, idempotent: bool = True) -> list:
+    """
+    Upsert score records {key, part, bib, [version], <primitives>…}; returns one result per
+    record, in order: {key, part, bib, ok, id, version} or {…, ok: False, errors: {field: [msg]}}.
+    Primitives left out of a record keep their stored value. A record carrying the version
+    it was edited from is rejected as a conflict ({…, conflict: True, current}) if the
+    score has moved on since. Rejected records are not remembered, so the client can fix
+    and resend them under the same key. idempotent=False (ingest_results, which tracks
+    whole files) neither looks keys up nor stores them; they only label the results.
+    """
+    records = [r if isinstance(r, dict) else {} for r in records]
+    # only string keys: str() would make 1 and "1", or None and "None", the same key
+    keys = [r['key'][:64] if isinstance(r.get('key'), str) else '' for r in records]
+    applied = {}
+    if idempotent:
+        applied = dict(ScoreSubmission.objects.filter(key__in=[k for k in keys if k]).values_list('key', 'result'))
+
+    parts = EventPart.objects.in_bulk([r['part'] for r in records if type(r.get('part')) is int])   # not True/False
+    athletes = {a.bib: a for a in Athlete.objects.filter(bib__in=[str(r.get('bib')) for r in records])}
+    scores = {(s.part_id, s.athlete_id): s
+              for s in Score.objects.filter(part__in=list(parts), athlete__in=list(athletes.values()))}
+
+    results, created, updated, submissions = [], {}, {}, []
+    for record, key in zip(records, keys):
+        if key and key in applied:
+            results.append(key)   # filled in below, once new scores have ids
+            continue
+        part = parts.get(record['part']) if type(record.get('part')) is int else None
+        athlete = athletes.get(str(record.get('bib')))
+        errors = {}
+        if record.get('key') is not None and not isinstance(record['key'], str):
+            errors['key'] = ['La clave de idempotencia debe ser texto.']
+        elif not key and idempotent:
+            errors['key'] = ['Falta la clave de idempotencia.']
+        if part is None:
+            errors['part'] = ['Parte inexistente.']
+        if athlete is None:
+            errors['bib'] = ['Dorsal inexistente.']
+        try:
+            version = None if record.get('version') is None else int(record['version'])
+        except (TypeError, ValueError):
+            errors['version'] = ['Versión inválida.']
+        if errors:
+            results.append(_result(key, record, False, errors=errors))
+            continue
+
+        fields = fields_for(part)
+        score = scores.get((part.pk, athlete.pk)) or Score()
+        score.part, score.athlete = part, athlete
+        data = {**forms.model_to_dict(score, fields), **{f: record[f] for f in fields if f in record}}
+        # validate on a copy: a rejected record must not leave half-applied values behind
+        form = _form_class(part)(data, instance=copy.copy(score))
+        if not form.is_valid():
+            results.append(_result(key, record, False, errors={f: list(e) for f, e in form.errors.items()}))
+            continue
+        if not form.has_changed():   # nothing new (or nothing entered yet): nothing to write
+            results.append(_result(key, record, True, id=score.pk, version=score.version, unchanged=True))
+            continue
+        if version is not None and score.pk is not None and version != score.version:
+            results.append(_conflict(key, record, score))
+            continue
+
+        for f in fields:
+            setattr(score, f, getattr(form.instance, f))
+        if score.pk is None:
+            created[part.pk, athlete.pk] = scores[part.pk, athlete.pk] = score
+        else:
+            updated[score.pk] = score
+        result = _result(key, record, True)
+        results.append(result)
+        submissions.append((key, score, result))
+        if key:
+            applied[key] = result   # the same key twice in one batch applies once
+
+    with transaction.atomic():
+        conflicts = save_scores(list(created.values()), list(updated.values()))
+        lost = {id(s) for s in conflicts}
+        current = _current(conflicts) if conflicts else {}
+        for key, score, result in submissions:
+            if id(score) in lost:
+                result.clear()
+                result.update(_conflict(key, records[keys.index(key)], current.get((score.part_id, score.athlete_id))))
+            else:
+                result.update(id=score.pk, version=score.version)
+        if idempotent:
+            prune_submissions()
+            ScoreSubmission.objects.bulk_create([ScoreSubmission(key=k, score=s, result=r)
+                                                 for k, s, r in submissions if id(s) not in lost],
+                                                ignore_conflicts=True)
+    return [{**applied[r], 'duplicate': True} if isinstance(r, str) else r for r in results]
@@ -0,0 +1,165 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import (
+    Score, Athlete, EventPart, Division, Event, Heat, LaneAssignment,
+    EventDivisionSpec, Announcement, Sponsor, Venue, refresh_heat_end_times,
+)
+from . import standings, caching, catalog, live, storage, images
+
+def schedule_refresh(part_id: int, division_id: int) -> None:
+    """Re-rank one (part, division) after commit, then invalidate pages and push the diff."""
+    def refresh():
+        changes = standings.refresh_ids(part_id, division_id)
+        caching.bump(caching.RESULTS)   # only once the new standings are readable
+        live.publish_changes(changes)
+
+    # after commit: cascades (part/athlete deletes) must finish before re-ranking
+    transaction.on_commit(refresh)
+
+def _schedule_refresh(score: Score) -> None:
+    if not score.part_id:
+        return
+    division_id = (Athlete.objects.filter(pk=score.athlete_id)
+                   .values_list('division_id', flat=True).first())
+    if division_id is None:
+        return
+    schedule_refresh(score.part_id, division_id)
+
+@receiver(post_save, sender=Score)
+def score_saved(sender, instance, **kwargs):
+    _schedule_refresh(instance)
+
+@receiver(post_delete, sender=Score)
+def score_deleted(sender, instance, **kwargs):
+    _schedule_refresh(instance)
+
+# Standing rows only cover active athletes of the division: moving or (de)activating an
+# athlete re-ranks the divisions involved
+def refresh_divisions(division_ids) -> None:
+    def refresh():
+        for division in Division.objects.filter(pk__in=division_ids):
+            standings.refresh_division(division)
+            live.publish_reset(division.pk)
+        caching.bump(caching.RESULTS)
+
+    transaction.on_commit(refresh)
+
+@receiver(pre_save, sender=Athlete)
+def athlete_before(sender, instance, **kwargs):
+    instance._ranked_as = (Athlete.objects.filter(pk=instance.pk).values_list('division_id', 'is_active').first()
+                           if instance.pk else None)
+
+@receiver(post_save, sender=Athlete)
+def athlete_saved(sender, instance, created, **kwargs):
+    before = getattr(instance, '_ranked_as', None)
+    if before and before != (instance.division_id, instance.is_active):
+        refresh_divisions({before[0], instance.division_id})
+
+@receiver(post_delete, sender=Athlete)
+def athlete_deleted(sender, instance, **kwargs):
+    refresh_divisions({instance.division_id})
+
+@receiver(post_save, sender=EventPart)
+def part_saved(sender, instance, created, **kwargs):
+    """scoring/counts_as_event may have changed: re-key its scores and re-rank every division."""
+    if created:
+        return
+    scores = list(Score.objects.filter(part=instance))
+    for s in scores:
+        s.set_rank_keys(instance.scoring)
+    Score.objects.bulk_update(scores, Score.RANK_FIELDS, batch_size=500)
+    part_id = instance.pk
+    for division_id in Division.objects.values_list('pk', flat=True):
+        transaction.on_commit(lambda d=division_id: standings.refresh_ids(part_id, d))
+
+# Heat.end_time depends on the event cap and the divisions' cap overrides (models.heat_caps)
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, created, **kwargs):
+    if not created:
+        refresh_heat_end_times([instance.pk])
+
+def _spec_changed(sender, instance, **kwargs):
+    event_id = EventPart.objects.filter(pk=instance.part_id).values_list('event_id', flat=True).first()
+    if event_id is not None:
+        refresh_heat_end_times([event_id])
+
+post_save.connect(_spec_changed, sender=EventDivisionSpec)
+post_delete.connect(_spec_changed, sender=EventDivisionSpec)
+
+def _part_added_or_removed(sender, instance, created=True, **kwargs):
+    # parts without an override take a share of the event cap
+    if created:
+        refresh_heat_end_times([instance.event_id])
+
+post_save.connect(_part_added_or_removed, sender=EventPart)
+post_delete.connect(_part_added_or_removed, sender=EventPart)
+
+# Reference data cached per process (core.catalog); other workers notice the EVENTS bump
+def _catalog_changed(sender, **kwargs):
+    catalog.invalidate()
+
+for _model in (Division, Event, EventPart, EventDivisionSpec):
+    post_save.connect(_catalog_changed, sender=_model)
+    post_delete.connect(_catalog_changed, sender=_model)
+
+# Reference counts of content-addressed media (core.storage): one per file field pointing at a blob.
+# A new image also gets its resized derivatives, in the background (core.images), and then
+# the pages showing it are bumped again: model → scopes whose pages embed its images.
+MEDIA_MODELS = {
+    Athlete: (caching.ROSTER,),
+    Sponsor: (caching.CONTENT,),
+    EventDivisionSpec: (caching.EVENTS,),
+}
+
+def _media_before(sender, instance, **kwargs):
+    fields = storage.blob_fields(sender)
+    before = sender.objects.filter(pk=instance.pk).values(*fields).first() if fields and instance.pk else None
+    instance._media_before = before or {}
+
+def media_changed(model, old: str, new: str) -> None:
+    """A file field of `model` went from `old` to `new`. Bulk writers, which send no
+    signals (import_competition), call this themselves."""
+    storage.incref(new)
+    storage.decref(old)
+    images.schedule(new, MEDIA_MODELS[model])
+
+def _media_saved(sender, instance, **kwargs):
+    before = getattr(instance, '_media_before', {})
+    for field in storage.blob_fields(sender):
+        old, new = before.get(field) or '', getattr(instance, field).name or ''
+        if old != new:
+            media_changed(sender, old, new)
+
+def _media_deleted(sender, instance, **kwargs):
+    for field in storage.blob_fields(sender):
+        storage.decref(getattr(instance, field).name or '')
+
+for _model in MEDIA_MODELS:
+    pre_save.connect(_media_before, sender=_model)
+    post_save.connect(_media_saved, sender=_model)
+    post_delete.connect(_media_deleted, sender=_model)
+
+# Which cached pages each model invalidates (Score bumps RESULTS itself, after re-ranking).
+# Connected last so their on_commit bumps run after the refreshes queued above.
+INVALIDATES = {
+    Athlete: (caching.RESULTS, caching.ROSTER),
+    Heat: (caching.SCHEDULE,),
+    LaneAssignment: (caching.SCHEDULE,),
+    EventPart: (caching.RESULTS, caching.EVENTS),
+    EventDivisionSpec: (caching.EVENTS, caching.SCHEDULE),
+    Event: caching.ALL_SCOPES,
+    Division: caching.ALL_SCOPES,
+    Announcement: (caching.CONTENT,),
+    Sponsor: (caching.CONTENT,),
+    Venue: (caching.CONTENT,),
+}
+
+def _bump_after_commit(scopes):
+    def handler(sender, **kwargs):
+        transaction.on_commit(lambda: caching.bump(*scopes))
+    return handler
+
+for _model, _scopes in INVALIDATES.items():
+    post_save.connect(_bump_after_commit(_scopes), sender=_model, weak=False)
+    post_delete.connect(_bump_after_commit(_scopes), sender=_model, weak=False)
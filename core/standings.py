@@ -0,0 +1,159 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import Standing, StandingsVersion, EventPart, Division
+from .ranking import rank_division, overall_places
+
+Row = Tuple[int, int, str]   # (place, points, display)
+
+class Diff(NamedTuple):
+    changed: Dict[int, Row]   # athlete_id → new row (new or different)
+    removed: List[int]        # athlete ids that no longer have a row
+
+    def __bool__(self):
+        return bool(self.changed or self.removed)
+
+class Changes(NamedTuple):
+    division_id: int
+    part_id: Optional[int]
+    part_rows: Dict[int, Row]   # full new state of the refreshed part
+    part: Diff
+    overall: Diff
+
+def current_version(division: Division) -> Tuple[int, int]:
+    """
+    (version, reset_version) of a division's standings. A division that was never
+    materialized (no StandingsVersion row, e.g. right after migrating) is built first.
+    """
+    rev = StandingsVersion.objects.filter(division=division).values_list('version', 'reset_version').first()
+    if rev is None:
+        ensure_built(division)
+        rev = StandingsVersion.objects.filter(division=division).values_list('version', 'reset_version').first()
+    return rev or (0, 0)
+
+def ensure_built(division: Division) -> bool:
+    """Build every part of the division unless it already was; True if it built it."""
+    with transaction.atomic():
+        # one builder per division; the others wait and then find the version row
+        Division.objects.select_for_update().filter(pk=division.pk).first()
+        if StandingsVersion.objects.filter(division=division).exists():
+            return False
+        refresh_division(division)
+        return True
+
+def _bump_version(division: Division) -> int:
+    """
+    Next standings version of the division; call inside the refresh transaction, before
+    reading scores: the UPDATE holds the version row until commit, one refresh at a time.
+    """
+    StandingsVersion.objects.get_or_create(division=division)
+    StandingsVersion.objects.filter(division=division).update(version=F('version') + 1)
+    return StandingsVersion.objects.get(division=division).version
+
+def _mark_reset(division: Division, version: int) -> None:
+    # rows disappeared: clients older than this can't catch up with row diffs
+    StandingsVersion.objects.filter(division=division).update(reset_version=version)
+
+def _replace(division: Division, part: Optional[EventPart], after: Dict[int, Row], version: int,
+             touched: Iterable[int] = ()) -> Diff:
+    """
+    Swap the stored rows of one scope (a part, or overall when part is None) for `after`.
+    Rows that changed, or whose athlete is in `touched`, are stamped with `version`;
+    the others keep their stamps.
+    """
+    qs = Standing.objects.filter(division=division)
+    qs = qs.filter(part=part) if part else qs.filter(part__isnull=True)
+    before, stamps = {}, {}
+    for aid, pl, pt, d, v, cv in qs.values_list('athlete_id', 'place', 'points', 'display',
+                                                 'version', 'created_version'):
+        before[aid], stamps[aid] = (pl, pt, d), (v, cv)
+
+    touched = set(touched)
+    diff = Diff({aid: row for aid, row in after.items() if aid in touched or before.get(aid) != row},
+                [aid for aid in before if aid not in after])
+    rows = []
+    for aid, (pl, pt, d) in after.items():
+        v, cv = stamps.get(aid, (version, version))
+        rows.append(Standing(division=division, part=part, athlete_id=aid, place=pl, points=pt,
+                             display=d, version=version if aid in diff.changed else v, created_version=cv))
+    qs.delete()
+    Standing.objects.bulk_create(rows)
+    return diff
+
+def refresh_part(part: EventPart, division: Division) -> Changes:
+    """
+    Re-rank a single (part, division) into the Standing table and recompute the
+    division's overall rows from the stored per-part rows. Other parts are untouched.
+    Returns what changed, for live pushes (core.live).
+    """
+    with transaction.atomic():
+        version = _bump_version(division)
+        # ranked under the version row's lock: a concurrent refresh can't commit an older snapshot last
+        rows = rank_division(division, [part], settings.RANKING_BACKEND).parts[part.id]
+        after = {r.athlete.id: (r.place, r.points, r.display) for r in rows}
+        cells = {aid: (pl, pt) for aid, pl, pt in
+                 Standing.objects.filter(division=division, part=part).values_list('athlete_id', 'place', 'points')}
+        part_diff = _replace(division, part, after, version)
+        # overall rows carry this part's (place, points) cell: a new place worth the same
+        # points (0 from 26th down) changes the row even though its total doesn't move
+        moved = [aid for aid, row in after.items() if cells.get(aid) != row[:2]]
+        overall = refresh_overall(division, version, moved)
+        if part_diff.removed:
+            _mark_reset(division, version)
+    return Changes(division.id, part.id, after, part_diff, overall)
+
+def refresh_overall(division: Division, version: Optional[int] = None, touched: Iterable[int] = ()) -> Diff:
+    """
+    Sum stored per-part points over counting parts; athletes with 0 total are left out.
+    `touched` athletes' rows count as changed even if place and total are the same.
+    """
+    totals = defaultdict(int)
+    for aid, pts in (Standing.objects
+                     .filter(division=division, part__counts_as_event=True)
+                     .values_list('athlete_id', 'points')):
+        totals[aid] += pts
+
+    after = {aid: (place, total, '') for (aid, total), place in overall_places(totals)}
+    with transaction.atomic():
+        if version is None:
+            version = _bump_version(division)
+        diff = _replace(division, None, after, version, touched)
+        if diff.removed:
+            _mark_reset(division, version)
+    return diff
+
+def refresh_ids(part_id: int, division_id: int) -> Optional[Changes]:
+    """on_commit entry point: the part may have been deleted in the same transaction."""
+    part = EventPart.objects.filter(pk=part_id).first()
+    division = Division.objects.filter(pk=division_id).first()
+    if division is None:
+        return None
+    if ensure_built(division):
+        return None   # whole division just built: clients were reset
+    if part is None:
+        return Changes(division.id, None, {}, Diff({}, []), refresh_overall(division))
+    return refresh_part(part, division)
+
+def refresh_division(division: Division) -> None:
+    """Every part of one division from a single ranking pass (clients start over)."""
+    with transaction.atomic():
+        version = _bump_version(division)
+        ranking = rank_division(division, backend=settings.RANKING_BACKEND)   # under the lock, as in refresh_part
+        _mark_reset(division, version)
+        Standing.objects.filter(division=division).delete()
+        Standing.objects.bulk_create(
+            [Standing(division=division, part_id=pid, athlete=r.athlete, place=r.place, points=r.points,
+                      display=r.display, version=version, created_version=version)
+             for pid, rows in ranking.parts.items() for r in rows] +
+            [Standing(division=division, part=None, athlete=r.athlete, place=r.place, points=r.points,
+                      version=version, created_version=version)
+             for r in ranking.overall]
+        )
+
+def rebuild_all() -> int:
+    """Recompute every division. Returns the number of Standing rows written."""
+    for division in Division.objects.all():
+        refresh_division(division)
+    return Standing.objects.count()
@@ -0,0 +1,77 @@
+"""
+Content-addressed media storage. Uploads are stored once as cas/<ab>/<sha256><ext>, so
+re-uploading a poster or photo reuses the existing file instead of piling up
+IMG_6661_JNW48sH.PNG-style copies. A name always means the same bytes, which is what
+lets core.media serve cas/ with immutable far-future cache headers.
+MediaBlob counts the model fields pointing at each file (core.signals keeps it current);
+the file is deleted after the last reference goes away.
+"""
+import hashlib
+import os
+import shutil
+from pathlib import PurePosixPath
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import F, FileField
+from .models import MediaBlob
+
+CAS_PREFIX = 'cas/'
+DERIVED_PREFIX = 'derived'   # resized copies of a blob, derived/<digest>/ (core.images)
+
+def content_hash(content) -> str:
+    h = hashlib.sha256()
+    for chunk in content.chunks():   # chunks() rewinds first
+        h.update(chunk)
+    return h.hexdigest()
+
+def blob_name(digest: str, original: str) -> str:
+    return f"{CAS_PREFIX}{digest[:2]}/{digest}{PurePosixPath(original).suffix.lower()}"
+
+def is_blob(name: str) -> bool:
+    return bool(name) and name.startswith(CAS_PREFIX)
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by content; identical uploads share one file."""
+
+    def get_available_name(self, name, max_length=None):
+        return name   # _save() picks the final name from the content, never a suffixed copy
+
+    def _save(self, name, content):
+        name = blob_name(content_hash(content), name)
+        if self.exists(name):
+            return name
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # write aside and rename: a blob that exists is always complete
+        tmp_path = f"{full_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for chunk in content.chunks():
+                f.write(chunk)
+        if self.file_permissions_mode is not None:
+            os.chmod(tmp_path, self.file_permissions_mode)
+        os.replace(tmp_path, full_path)
+        return name
+
+def blob_fields(model) -> list:
+    """attnames of the model's file fields stored in content-addressed storage."""
+    return [f.attname for f in model._meta.fields
+            if isinstance(f, FileField) and isinstance(f.storage, ContentAddressedStorage)]
+
+def incref(name: str, storage=default_storage) -> None:
+    if not is_blob(name):
+        return
+    size = storage.size(name) if storage.exists(name) else 0
+    MediaBlob.objects.get_or_create(name=name, defaults={'size': size})
+    MediaBlob.objects.filter(name=name).update(refs=F('refs') + 1)
+
+def decref(name: str, storage=default_storage) -> None:
+    if not is_blob(name):
+        return
+    MediaBlob.objects.filter(name=name, refs__gt=0).update(refs=F('refs') - 1)
+
+    def collect():
+        # re-checked after commit: another row may have picked the same content up meanwhile
+        if MediaBlob.objects.filter(name=name, refs=0).delete()[0]:
+            storage.delete(name)
+            shutil.rmtree(os.path.join(storage.location, DERIVED_PREFIX, PurePosixPath(name).stem), ignore_errors=True)
+    transaction.on_commit(collect)
@@ -1,7 +1,7 @@
 from django import template
 from django.utils.safestring import mark_safe
-from django.utils.html import escape
 import builtins
+from core import utils, images
 
 register = template.Library()
 
@@ -18,14 +18,8 @@ def get_item(d, key):
 
 @register.filter
 def markdownify(text):
-    if not text:
-        return ""
-    try:
-        import markdown
-        html = markdown.markdown(text, extensions=["extra", "sane_lists"])
-        return mark_safe(html)
-    except Exception:
-        return mark_safe(escape(text).replace("\n", "<br>"))
+    """Ad-hoc Markdown; stored descriptions have description_html already rendered."""
+    return mark_safe(utils.render_markdown(text or ''))
     
 @register.filter
 def get_item(d, key):
@@ -39,15 +33,14 @@ def score_display(s):
     """Pretty print a Score according to its part.scoring."""
     if not s or not getattr(s, 'part', None):
         return ''
-    p = s.part
-    if p.scoring == 'time_then_reps':
-        if s.finished and s.time_seconds is not None:
-            total = (s.time_seconds or 0) + (s.penalty_seconds or 0)
-            m = int(total // 60); sec = int(round(total - m*60))
-            return f"{m}:{sec:02d}"
-        reps = (s.reps or 0) - (s.penalty_reps or 0)
-        return f"{reps} reps"
-    if p.scoring == 'reps':
-        return f"{(s.reps or 0) - (s.penalty_reps or 0)} reps"
-    # weight
-    return f"{(s.weight or 0):g}"
+    return utils.score_display(s.part.scoring, s)
+
+@register.filter
+def srcset(field, ext='webp'):
+    """'url 160w, url 320w, …' for an image field's derivatives; '' until they exist."""
+    return images.srcset(field.name, ext) if field else ''
+
+@register.filter
+def lqip(field):
+    """Blurred placeholder data: URI for an image field, or ''."""
+    return images.lqip(field.name) if field else ''
@@ -1,3 +1,626 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .models import (Athlete, Division, Event, EventDivisionSpec, EventPart, Heat, ImportChecksum, LaneAssignment,
+                     MediaBlob, Score, ScoreSubmission, Standing, StandingsVersion, heat_caps)
+from .admin import ScoreAdminForm
+from .utils import render_markdown
+from . import images, ranking, schedule, scoring, standings
 
-# Create your tests here.
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# no collectstatic in tests: plain static URLs instead of the manifest's hashed names
+STATIC = {**settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+
+@override_settings(CACHES=LOCMEM, STORAGES=STATIC, SCORE_MODERATION=False)
+class CompetitionTestCase(TestCase):
+    """A division, one reps event in one heat, and a few athletes in lanes."""
+    athletes = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        # on_commit never fires inside a TestCase: run the signal callbacks (catalog, caches) now
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.division = Division.objects.create(sex='F', category='sx', display_name='Femenino Sx')
+            cls.event = Event.objects.create(number=1, name='Uno', type='amrap', cap_seconds=600)
+            cls.part = EventPart.objects.create(event=cls.event, name='Main', scoring='reps')
+            cls.heat = Heat.objects.create(event=cls.event, division=cls.division, number=1,
+                                           start_time=timezone.now() + timedelta(hours=1))
+            cls.roster = [Athlete.objects.create(bib=str(100 + i), first_name='A', last_name=f"Atleta {i}",
+                                                 division=cls.division) for i in range(cls.athletes)]
+            for lane, a in enumerate(cls.roster, start=1):
+                LaneAssignment.objects.create(heat=cls.heat, lane=lane, athlete=a)
+        cls.staff = User.objects.create_superuser('juez', password='x')
+
+    def setUp(self):
+        cache.clear()   # rendered pages and generation counters of the previous test
+        self.client.force_login(self.staff)
+
+    def score(self, athlete, **values):
+        return Score.objects.create(part=self.part, athlete=athlete, **values)
+
+class StaffScoresTests(CompetitionTestCase):
+    def post_lanes(self, rows):
+        """POST the staff page: rows are {bib, version, reps} in the page's order (last name)."""
+        data = {'form-TOTAL_FORMS': len(self.roster), 'form-INITIAL_FORMS': len(self.roster)}
+        for i, a in enumerate(self.roster):
+            row = rows.get(a.bib, {})
+            data.update({f"form-{i}-bib": a.bib, f"form-{i}-version": row.get('version', 0),
+                         f"form-{i}-reps": row.get('reps', ''), f"form-{i}-penalty_reps": 0,
+                         f"form-{i}-notes": ''})
+        return self.client.post(reverse('staff_scores') + '?event=1&sexo=F&cat=sx', data)
+
+    def test_conflict_is_shown_and_not_written(self):
+        s = self.score(self.roster[0], reps=10)
+        Score.objects.filter(pk=s.pk).update(reps=12, version=1)   # another judge saved meanwhile
+        r = self.post_lanes({self.roster[0].bib: {'version': 0, 'reps': 15}})
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, scoring.CONFLICT)
+        s.refresh_from_db()
+        self.assertEqual((s.reps, s.version), (12, 1))
+        # the page now carries the current version: saving again overwrites knowingly
+        r = self.post_lanes({self.roster[0].bib: {'version': 1, 'reps': 15}})
+        self.assertEqual(r.status_code, 302)
+        s.refresh_from_db()
+        self.assertEqual((s.reps, s.version), (15, 2))
+
+    def test_unchanged_rows_are_not_written(self):
+        kept = self.score(self.roster[0], reps=10)
+        edited = self.score(self.roster[1], reps=20)
+        r = self.post_lanes({kept.athlete.bib: {'version': 0, 'reps': 10},
+                             edited.athlete.bib: {'version': 0, 'reps': 21}})
+        self.assertEqual(r.status_code, 302)
+        before = kept.updated_at
+        kept.refresh_from_db()
+        edited.refresh_from_db()
+        self.assertEqual((kept.version, kept.updated_at), (0, before))
+        self.assertEqual((edited.reps, edited.version), (21, 1))
+        # an empty lane stays without a Score row
+        self.assertFalse(Score.objects.filter(athlete=self.roster[2]).exists())
+
+class ScoreAdminTests(CompetitionTestCase):
+    def post_admin(self, score, **values):
+        data = {'part': self.part.pk, 'athlete': score.athlete_id, 'reps': score.reps, 'time_seconds': '',
+                'weight': '', 'tiebreak_seconds': '', 'penalty_seconds': 0, 'penalty_reps': 0, 'notes': '',
+                'status': 'approved', 'version': score.version, '_save': 'Guardar', **values}
+        return self.client.post(reverse('admin:core_score_change', args=[score.pk]), data)
+
+    def test_invalid_post_leaves_version_alone(self):
+        s = self.score(self.roster[0], reps=10)
+        r = self.post_admin(s, reps='abc')
+        self.assertEqual(r.status_code, 200)
+        s.refresh_from_db()
+        self.assertEqual((s.reps, s.version), (10, 0))
+        # fixing the field and resubmitting the same form isn't a conflict
+        r = self.post_admin(s, reps=11)
+        self.assertEqual(r.status_code, 302)
+        s.refresh_from_db()
+        self.assertEqual((s.reps, s.version), (11, 1))
+
+    def test_stale_version_is_a_conflict(self):
+        s = self.score(self.roster[0], reps=10)
+        Score.objects.filter(pk=s.pk).update(reps=12, version=1)
+        r = self.post_admin(s, reps=11)
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, 'Otro usuario modificó este score')
+        s.refresh_from_db()
+        self.assertEqual((s.reps, s.version), (12, 1))
+
+    def test_write_between_clean_and_save_is_a_conflict(self):
+        s = self.score(self.roster[0], reps=10)
+        clean = ScoreAdminForm.clean
+
+        def clean_then_race(form):
+            cleaned = clean(form)
+            Score.objects.filter(pk=s.pk).update(reps=12, version=1)   # lands after the check
+            return cleaned
+
+        with mock.patch.object(ScoreAdminForm, 'clean', clean_then_race):
+            r = self.post_admin(s, reps=11)
+        self.assertRedirects(r, reverse('admin:core_score_change', args=[s.pk]), fetch_redirect_response=False)
+        # the whole POST rolled back (the simulated writer shared its transaction, so it went too)
+        s.refresh_from_db()
+        self.assertEqual((s.reps, s.version), (10, 0))
+
+class LiveStreamTests(CompetitionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.logout()   # public pages
+        self.score(self.roster[0], reps=10)
+        standings.refresh_division(self.division)
+
+    def test_wsgi_default_polls_only(self):
+        r = self.client.get(reverse('leaderboard') + '?sexo=F&cat=sx')
+        self.assertContains(r, 'id="lb-body"')
+        self.assertNotContains(r, 'data-stream')
+        self.assertContains(r, reverse('leaderboard_rows'))
+        self.assertEqual(self.client.get(reverse('leaderboard_stream') + '?sexo=F&cat=sx').status_code, 404)
+
+    @override_settings(LIVE_STREAM=True)
+    def test_asgi_offers_the_stream(self):
+        r = self.client.get(reverse('leaderboard') + '?sexo=F&cat=sx')
+        self.assertContains(r, f'data-stream="{reverse("leaderboard_stream")}?cat=sx&sexo=F"')
+
+class MyDayTests(CompetitionTestCase):
+    def test_places_come_from_the_standings(self):
+        me, other = self.roster[0], self.roster[1]
+        me.user = User.objects.create_user('atleta', password='x')
+        me.save()
+        self.score(me, reps=10)
+        self.score(other, reps=20)
+        self.client.force_login(me.user)
+        r = self.client.get(reverse('my_day'))
+        self.assertEqual(r.context['my_results'], {self.part.pk: {'place': 2, 'points': 96}})
+        self.assertContains(r, 'P2 (96 pts)')
+
+class RankingBackendTests(CompetitionTestCase):
+    athletes = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        a = cls.roster
+        cls.timed = EventPart.objects.create(event=Event.objects.create(number=2, name='Dos', type='time'),
+                                             name='Main', scoring='time_then_reps')
+        cls.lift = EventPart.objects.create(event=Event.objects.create(number=3, name='Tres', type='max'),
+                                            name='Main', scoring='weight', counts_as_event=False)
+        timed = [  # full tie, missing tiebreak ranks after, penalty pushes back, capped on reps
+            (a[0], dict(finished=True, time_seconds=300, tiebreak_seconds=100)),
+            (a[1], dict(finished=True, time_seconds=300, tiebreak_seconds=100)),
+            (a[2], dict(finished=True, time_seconds=300)),
+            (a[3], dict(finished=True, time_seconds=290, penalty_seconds=15)),
+            (a[4], dict(reps=50)),
+            (a[5], dict(reps=50)),
+            (a[6], dict(finished=True, time_seconds=100)),
+        ]
+        reps = [(a[0], dict(reps=10)), (a[1], dict(reps=10)), (a[2], dict(reps=12)), (a[3], dict()),
+                (a[4], dict(reps=99, status='pending')), (a[6], dict(reps=500))]
+        lift = [(a[0], dict(weight=100)), (a[1], dict(weight=100.5)), (a[2], dict(weight=100))]
+        for part, rows in ((cls.timed, timed), (cls.part, reps), (cls.lift, lift)):
+            for athlete, values in rows:
+                Score.objects.create(part=part, athlete=athlete, **values)
+        Athlete.objects.filter(pk=a[6].pk).update(is_active=False)
+
+    def ranked(self, backend):
+        r = ranking.rank_division(self.division, backend=backend)
+        return ({pid: [(row.athlete.id, row.place, row.points, row.display) for row in rows]
+                 for pid, rows in r.parts.items()},
+                [(row.athlete.id, row.place, row.points, row.by_part) for row in r.overall])
+
+    def places(self, parts, part):
+        return [(aid, place, points) for aid, place, points, _ in parts[part.pk]]
+
+    def test_python_places(self):
+        a = [x.pk for x in self.roster]
+        parts, overall = self.ranked('python')
+        self.assertEqual(self.places(parts, self.timed), [(a[0], 1, 100), (a[1], 1, 100), (a[2], 3, 92),
+                                                          (a[3], 4, 88), (a[4], 5, 84), (a[5], 5, 84)])
+        self.assertEqual(self.places(parts, self.part), [(a[2], 1, 100), (a[0], 2, 96), (a[1], 2, 96)])
+        self.assertEqual(self.places(parts, self.lift), [(a[1], 1, 0), (a[0], 2, 0), (a[2], 2, 0)])
+        self.assertEqual([(aid, place, points) for aid, place, points, _ in overall],
+                         [(a[0], 1, 196), (a[1], 1, 196), (a[2], 3, 192), (a[3], 4, 88), (a[4], 5, 84), (a[5], 5, 84)])
+
+    def test_athlete_place_matches_rank_division(self):
+        parts, _ = self.ranked('python')
+        for part in (self.timed, self.part, self.lift):
+            expected = {aid: (place, points) for aid, place, points, _ in parts[part.pk]}
+            for athlete in self.roster:
+                with self.subTest(part=part.scoring, bib=athlete.bib):
+                    self.assertEqual(ranking.athlete_place(athlete, part), expected.get(athlete.pk))
+
+    def test_backends_agree(self):
+        expected = self.ranked('python')
+        for backend in ('numpy', 'sql'):
+            with self.subTest(backend=backend):
+                self.assertEqual(self.ranked(backend), expected)
+
+class OverallDiffTests(CompetitionTestCase):
+    athletes = 28   # places from 26th down are worth 0 points
+
+    def test_part_place_change_without_points_marks_the_overall_row(self):
+        part_b = EventPart.objects.create(event=self.event, name='Part B', slug='B', scoring='reps', order=2)
+        for i, a in enumerate(self.roster):
+            self.score(a, reps=100 - i)   # 27th and 28th here…
+            Score.objects.create(part=part_b, athlete=a, reps=i)   # …but 2nd and 1st in B
+        standings.refresh_division(self.division)
+        last, second_last = self.roster[27], self.roster[26]
+        Score.objects.filter(part=self.part, athlete=second_last).update(reps=50)   # now 28th
+        changes = standings.refresh_part(self.part, self.division)
+        version, _ = standings.current_version(self.division)
+        self.assertEqual(sorted(changes.part.changed), sorted([last.pk, second_last.pk]))
+        self.assertEqual(sorted(changes.overall.changed), sorted([last.pk, second_last.pk]))
+        overall = Standing.objects.filter(division=self.division, part__isnull=True)
+        self.assertEqual(dict(overall.filter(version=version).values_list('athlete_id', 'points')),
+                         {last.pk: 100, second_last.pk: 96})
+
+class ApplyBatchTests(CompetitionTestCase):
+    def record(self, key, athlete, **values):
+        return {'key': key, 'part': self.part.pk, 'bib': athlete.bib, **values}
+
+    def test_resent_key_returns_the_stored_result(self):
+        first = scoring.apply_batch([self.record('k1', self.roster[0], reps=10)])
+        self.assertTrue(first[0]['ok'])
+        # the client never saw the answer and resends, with a value typed meanwhile
+        again = scoring.apply_batch([self.record('k1', self.roster[0], reps=11)])
+        self.assertEqual(again, [{**first[0], 'duplicate': True}])
+        s = Score.objects.get(athlete=self.roster[0])
+        self.assertEqual((s.reps, s.version), (10, 0))
+
+    def test_same_key_twice_in_one_batch_applies_once(self):
+        results = scoring.apply_batch([self.record('k1', self.roster[0], reps=10),
+                                       self.record('k1', self.roster[1], reps=20)])
+        self.assertEqual(results[1], {**results[0], 'duplicate': True})
+        self.assertFalse(Score.objects.filter(athlete=self.roster[1]).exists())
+
+    def test_stale_version_is_a_conflict(self):
+        s = self.score(self.roster[0], reps=10)
+        Score.objects.filter(pk=s.pk).update(reps=12, version=1)
+        [result] = scoring.apply_batch([self.record('k1', self.roster[0], version=0, reps=15)])
+        self.assertFalse(result['ok'])
+        self.assertTrue(result['conflict'])
+        self.assertEqual((result['current']['reps'], result['current']['version']), (12, 1))
+        s.refresh_from_db()
+        self.assertEqual((s.reps, s.version), (12, 1))
+        # a rejected record isn't remembered: the same key goes through with the new version
+        [result] = scoring.apply_batch([self.record('k1', self.roster[0], version=1, reps=15)])
+        self.assertTrue(result['ok'])
+        self.assertEqual(result['version'], 2)
+
+    def test_bad_rows_fail_alone(self):
+        results = scoring.apply_batch([
+            self.record('ok', self.roster[0], reps=10),
+            self.record('reps', self.roster[1], reps='abc'),
+            {'key': 'bool', 'part': True, 'bib': self.roster[1].bib, 'reps': 5},
+            self.record(7, self.roster[1], reps=5),
+            self.record('', self.roster[1], reps=5),
+            self.record('bib', self.roster[1], reps=5) | {'bib': 'nope'},
+            'not a record',
+        ])
+        self.assertTrue(results[0]['ok'])
+        self.assertEqual([sorted(r['errors']) for r in results[1:]],
+                         [['reps'], ['part'], ['key'], ['key'], ['bib'], ['bib', 'key', 'part']])
+        self.assertEqual(results[3]['key'], '')   # 7 isn't stored as "7"
+        self.assertEqual(Score.objects.get().athlete, self.roster[0])
+        # only the applied record's key is remembered
+        again = scoring.apply_batch([self.record('reps', self.roster[1], reps=20)])
+        self.assertTrue(again[0]['ok'])
+        self.assertNotIn('duplicate', again[0])
+
+    @override_settings(SCORE_SUBMISSION_RETENTION_DAYS=7)
+    def test_old_keys_are_pruned(self):
+        scoring.apply_batch([self.record('old', self.roster[0], reps=10),
+                             self.record('recent', self.roster[1], reps=10)])
+        now = timezone.now()
+        ScoreSubmission.objects.filter(key='old').update(created_at=now - timedelta(days=8))
+        ScoreSubmission.objects.filter(key='recent').update(created_at=now - timedelta(days=6))
+        scoring.apply_batch([self.record('new', self.roster[2], reps=10)])
+        self.assertEqual(set(ScoreSubmission.objects.values_list('key', flat=True)), {'recent', 'new'})
+        # a rejected-only batch stores nothing but still prunes
+        ScoreSubmission.objects.filter(key='recent').update(created_at=now - timedelta(days=8))
+        scoring.apply_batch([self.record('bad', self.roster[0], reps='abc')])
+        self.assertEqual(list(ScoreSubmission.objects.values_list('key', flat=True)), ['new'])
+
+@override_settings(SCORE_MODERATION=True)
+class ApproveTests(CompetitionTestCase):
+    def places(self):
+        return dict(Standing.objects.filter(part=self.part).values_list('athlete__bib', 'place'))
+
+    def test_approved_scores_count_and_refresh_the_standings(self):
+        standings.refresh_division(self.division)
+        with self.captureOnCommitCallbacks(execute=True):
+            results = scoring.apply_batch([{'key': f"k{i}", 'part': self.part.pk, 'bib': a.bib, 'reps': 10 * (i + 1)}
+                                           for i, a in enumerate(self.roster)])
+        self.assertEqual(set(Score.objects.values_list('status', flat=True)), {'pending'})
+        self.assertEqual(self.places(), {})
+        before = standings.current_version(self.division)
+        seen = {r['id']: r['version'] for r in results}
+        Score.objects.filter(athlete=self.roster[0]).update(reps=5, version=1)   # edited after it was seen
+        with self.captureOnCommitCallbacks(execute=True):
+            approved = scoring.approve(seen)
+        self.assertEqual(approved, {r['id'] for r in results[1:]})
+        self.assertEqual(dict(Score.objects.values_list('athlete__bib', 'status')),
+                         {'100': 'pending', '101': 'approved', '102': 'approved'})
+        self.assertEqual(self.places(), {'102': 1, '101': 2})
+        self.assertGreater(standings.current_version(self.division), before)
+        self.assertEqual(scoring.approve(seen), set())   # nothing pending at those versions any more
+
+class RenderMarkdownTests(SimpleTestCase):
+    def test_unsafe_schemes_lose_the_link(self):
+        for url in ('javascript:alert(1)', 'javascript&#58;alert(1)', 'javascript&colon;alert(1)',
+                    'jav&#x09;ascript:alert(1)', ' JAVASCRIPT:alert(1)', 'data:text/html;base64,PHNjcmlwdD4='):
+            with self.subTest(url=url):
+                self.assertEqual(render_markdown(f"[a]({url})"), '<p><a>a</a></p>')
+        self.assertEqual(render_markdown('![i](data:image/png;base64,xx)'), '<p><img alt="i" /></p>')
+
+    def test_safe_links_are_kept(self):
+        for url in ('https://example.com/a', 'http://example.com', 'mailto:info@example.com',
+                    '/eventos?event=1', 'eventos#e1', '#premios'):
+            with self.subTest(url=url):
+                self.assertEqual(render_markdown(f"[a]({url})"), f'<p><a href="{url}">a</a></p>')
+
+    def test_no_attributes_from_the_source(self):
+        self.assertEqual(render_markdown('text\n{: onclick="alert(1)"}'), '<p>text\n{: onclick="alert(1)"}</p>')
+        self.assertEqual(render_markdown('# hi {: onmouseover=alert(1) }'), '<h1>hi {: onmouseover=alert(1) }</h1>')
+        self.assertEqual(render_markdown('```{ .py onclick="x" style="y" }\ncode\n```'),
+                         '<pre><code class="language-py">code\n</code></pre>')
+
+    def test_raw_html_is_text(self):
+        self.assertEqual(render_markdown('<script>alert(1)</script>'),
+                         '<p>&lt;script&gt;alert(1)&lt;/script&gt;</p>')
+        self.assertEqual(render_markdown('<img src=x onerror=alert(1)>\n\n<div onclick="x">y</div>'),
+                         '<p>&lt;img src=x onerror=alert(1)&gt;</p>\n<p>&lt;div onclick="x"&gt;y&lt;/div&gt;</p>')
+
+    def test_markdown_still_renders(self):
+        self.assertIn('<table>', render_markdown('| a | b |\n|---|---|\n| 1 | 2 |'))
+        self.assertEqual(render_markdown('**21-15-9**'), '<p><strong>21-15-9</strong></p>')
+
+class HeatCapTests(CompetitionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.part_b = EventPart.objects.create(event=self.event, name='Part B', slug='B', scoring='reps', order=2)
+        self.other = Division.objects.create(sex='M', category='sx', display_name='Masculino Sx')
+        self.other_heat = Heat.objects.create(event=self.event, division=self.other, number=1,
+                                              start_time=self.heat.start_time)
+
+    def override(self, part, seconds):
+        EventDivisionSpec.objects.create(part=part, division=self.division, cap_seconds=seconds)
+
+    def length(self, heat):
+        heat.refresh_from_db()
+        return (heat.end_time - heat.start_time).total_seconds()
+
+    def test_event_cap_without_overrides(self):
+        self.assertEqual(heat_caps([self.event.pk]), {(self.event.pk, None): 600})
+        self.assertEqual((self.length(self.heat), self.length(self.other_heat)), (600, 600))
+
+    def test_shorter_overrides_shorten_the_heat(self):
+        self.override(self.part, 120)   # part B keeps its share of the event cap: 300
+        self.assertEqual(heat_caps([self.event.pk])[self.event.pk, self.division.pk], 420)
+        self.override(self.part_b, 180)
+        self.assertEqual(heat_caps([self.event.pk])[self.event.pk, self.division.pk], 300)
+        self.assertEqual((self.length(self.heat), self.length(self.other_heat)), (300, 600))
+
+    def test_longer_overrides_lengthen_the_heat(self):
+        self.override(self.part, 500)
+        self.override(self.part_b, 400)
+        self.assertEqual(self.length(self.heat), 900)
+
+    def test_end_time_follows_cap_and_start_changes(self):
+        self.override(self.part, 120)
+        self.event.cap_seconds = 800   # B's share becomes 400
+        self.event.save()
+        self.assertEqual((self.length(self.heat), self.length(self.other_heat)), (520, 800))
+        EventPart.objects.create(event=self.event, name='Part C', slug='C', scoring='reps', order=3)
+        self.assertEqual(self.length(self.heat), 653)   # 120 + 2 × 800/3, rounded
+        self.heat.start_time += timedelta(minutes=10)
+        self.heat.save()
+        self.assertEqual(self.length(self.heat), 653)
+
+class ShiftFromTests(CompetitionTestCase):
+    """Event 1 (F): heat 1 at T and heat 2 at T+15; event 2 (M) stays put unless asked."""
+    def setUp(self):
+        super().setUp()
+        self.t = self.heat.start_time
+        self.heat2 = self.add_heat(self.event, self.division, 2, 15, {5: self.roster[0]})
+        self.other = Division.objects.create(sex='M', category='sx', display_name='Masculino Sx')
+        self.event2 = Event.objects.create(number=2, name='Dos', type='amrap', cap_seconds=600)
+        self.m = Athlete.objects.create(bib='200', first_name='B', last_name='Atleta M', division=self.other)
+
+    def add_heat(self, event, division, number, minutes, lanes):
+        heat = Heat.objects.create(event=event, division=division, number=number,
+                                   start_time=self.t + timedelta(minutes=minutes))
+        for lane, a in lanes.items():
+            LaneAssignment.objects.create(heat=heat, lane=lane, athlete=a)
+        return heat
+
+    def starts(self, *heats):
+        return [(Heat.objects.get(pk=h.pk).start_time - self.t).total_seconds() / 60 for h in heats]
+
+    def test_new_overlaps_sharing_a_lane_or_athlete_clash(self):
+        by_athlete = self.add_heat(self.event2, self.other, 1, 25, {7: self.roster[1]})   # same athlete, own lane
+        by_lane = self.add_heat(self.event2, self.other, 2, 30, {5: self.m})               # heat2's lane 5
+        apart = self.add_heat(self.event2, self.other, 3, 50, {1: self.roster[0]})         # still clear after
+        with self.captureOnCommitCallbacks(execute=True):
+            moved, clashes = schedule.shift_from(self.heat, 20)
+        self.assertEqual(moved, 2)
+        self.assertEqual(self.starts(self.heat, self.heat2, by_athlete, by_lane, apart), [20, 35, 25, 30, 50])
+        self.assertEqual(Heat.objects.get(pk=self.heat.pk).end_time, self.t + timedelta(minutes=30))
+        self.assertEqual([(c.moved.pk, c.other.pk, c.lanes, [a.bib for a in c.athletes]) for c in clashes],
+                         [(self.heat.pk, by_athlete.pk, [], ['101']), (self.heat2.pk, by_lane.pk, [5], [])])
+
+    def test_overlaps_that_were_already_there_are_not_clashes(self):
+        self.add_heat(self.event2, self.other, 1, 5, {1: self.m})   # overlaps heat 1 before and after
+        self.add_heat(self.event2, self.other, 2, 40, {9: self.m})  # new overlap, nothing shared
+        moved, clashes = schedule.shift_from(self.heat, 2)
+        self.assertEqual((moved, clashes), (2, []))
+        self.assertEqual(schedule.shift_from(self.heat, 25), (2, []))
+
+    def test_later_events_move_along(self):
+        later = self.add_heat(self.event2, self.other, 1, 25, {7: self.roster[1]})
+        moved, clashes = schedule.shift_from(self.heat2, -10, later_events=True)
+        self.assertEqual(moved, 2)
+        # pulled into heat 1, which didn't move and has bib 100 too
+        self.assertEqual([(c.moved.pk, c.other.pk, c.lanes, [a.bib for a in c.athletes]) for c in clashes],
+                         [(self.heat2.pk, self.heat.pk, [], ['100'])])
+        self.assertEqual(self.starts(self.heat, self.heat2, later), [0, 5, 15])
+
+class SeedHeatsTests(CompetitionTestCase):
+    def setUp(self):
+        super().setUp()
+        for i, a in enumerate(self.roster):
+            self.score(a, reps=10 * (i + 1))   # 102 best, 100 last
+
+    def lanes(self):
+        return sorted(LaneAssignment.objects.filter(heat__event=self.event)
+                      .values_list('heat__number', 'lane', 'athlete__bib'))
+
+    def test_unbuilt_standings_are_built_first(self):
+        self.assertFalse(StandingsVersion.objects.filter(division=self.division).exists())
+        call_command('seed_heats', '--event', '1', '--lanes', '2', stdout=io.StringIO())
+        self.assertTrue(StandingsVersion.objects.filter(division=self.division).exists())
+        # leaders in the last heat, center-out (lane 1 first for 2 lanes); the rest in heat 1
+        self.assertEqual(self.lanes(), [(1, 1, '100'), (2, 1, '102'), (2, 2, '101')])
+
+    def test_built_standings_are_used_as_stored(self):
+        standings.refresh_division(self.division)
+        before = standings.current_version(self.division)
+        Score.objects.filter(athlete=self.roster[0]).update(reps=99)   # no refresh yet
+        result = schedule.seed_heats(self.event, self.heat.start_time, [self.division], lane_count=2)
+        self.assertEqual(standings.current_version(self.division), before)
+        self.assertEqual(self.lanes(), [(1, 1, '100'), (2, 1, '102'), (2, 2, '101')])
+        # heat 1 goes from 8 lanes to 2 and keeps bib 100 in lane 1
+        self.assertEqual(result, schedule.Seeding(heats=2, created=1, moved=1, deleted=0, lanes=2))
+        # re-running with the same standings writes nothing
+        self.assertEqual(schedule.seed_heats(self.event, self.heat.start_time, [self.division], lane_count=2),
+                         schedule.Seeding(heats=2, created=0, moved=0, deleted=0, lanes=0))
+
+def png(size=(400, 300), color='red') -> bytes:
+    buf = io.BytesIO()
+    Image.new('RGB', size, color).save(buf, 'PNG')
+    return buf.getvalue()
+
+class MediaTestCase(CompetitionTestCase):
+    """Uploads go to a throwaway MEDIA_ROOT."""
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+class ImageDerivativeTests(MediaTestCase):
+    def test_pages_re_render_once_derivatives_exist(self):
+        jobs = []
+        with mock.patch.object(images._executor, 'submit', lambda fn, *args: jobs.append((fn, args))):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.roster[0].photo.save('me.png', ContentFile(png()))
+        self.client.logout()
+        url = reverse('athletes') + '?sexo=F&cat=sx'
+        # rendered (and cached) after the upload's bump, before the thread pool got to it
+        self.assertNotContains(self.client.get(url), '/derived/')
+        for fn, args in jobs:
+            fn(*args)
+        self.assertContains(self.client.get(url), '/derived/')
+
+class MediaServeTests(MediaTestCase):
+    path = 'docs/heats.bin'
+    data = bytes(range(256)) * 4   # 1024 bytes, not compressible
+
+    def setUp(self):
+        super().setUp()
+        full = os.path.join(settings.MEDIA_ROOT, self.path)
+        os.makedirs(os.path.dirname(full))
+        with open(full, 'wb') as f:
+            f.write(self.data)
+        self.url = settings.MEDIA_URL + self.path
+
+    def get(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file(self):
+        r = self.get()
+        self.assertEqual((r.status_code, r['Accept-Ranges']), (200, 'bytes'))
+        self.assertEqual(self.body(r), self.data)
+
+    def test_range(self):
+        r = self.get(range='bytes=100-199')
+        self.assertEqual((r.status_code, r['Content-Range'], r['Content-Length']), (206, 'bytes 100-199/1024', '100'))
+        self.assertEqual(self.body(r), self.data[100:200])
+
+    def test_suffix_range(self):
+        r = self.get(range='bytes=-24')
+        self.assertEqual((r.status_code, r['Content-Range']), (206, 'bytes 1000-1023/1024'))
+        self.assertEqual(self.body(r), self.data[-24:])
+
+    def test_range_past_the_end(self):
+        r = self.get(range='bytes=1024-')
+        self.assertEqual((r.status_code, r['Content-Range']), (416, 'bytes */1024'))
+
+    def test_if_range_with_a_stale_etag_sends_everything(self):
+        r = self.get(range='bytes=0-9', if_range='"stale"')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.body(r), self.data)
+        etag = r['ETag']
+        r = self.get(range='bytes=0-9', if_range=etag)
+        self.assertEqual((r.status_code, self.body(r)), (206, self.data[:10]))
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.get()['ETag']
+        r = self.get(if_none_match=etag)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r['ETag'], etag)
+
+    @override_settings(MEDIA_SERVE='x-accel', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_x_accel_offload(self):
+        r = self.get(range='bytes=0-9')
+        self.assertEqual((r.status_code, r.content), (200, b''))
+        self.assertEqual(r['X-Accel-Redirect'], '/protected-media/' + self.path)
+        self.assertNotIn('X-Sendfile', r)
+
+    @override_settings(MEDIA_SERVE='x-sendfile')
+    def test_x_sendfile_offload(self):
+        r = self.get()
+        self.assertEqual(r['X-Sendfile'], os.path.join(settings.MEDIA_ROOT, self.path))
+
+class ImportCompetitionTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, True)
+        photo = os.path.join(self.folder, 'IMG_0001.png')
+        with open(photo, 'wb') as f:
+            f.write(png())
+        with open(os.path.join(self.folder, 'athletes.csv'), 'w', encoding='utf-8') as f:
+            f.write('bib,first_name,last_name,sex,category,photo_path\n'
+                    f'200,Ana,Uno,F,sx,{photo}\n201,Bea,Dos,F,sx,{photo}\n')
+
+    def run_import(self, **opts):
+        out = io.StringIO()
+        call_command('import_competition', path=self.folder, stdout=out, **opts)
+        return out.getvalue()
+
+    def media_files(self):
+        return sorted(os.path.relpath(os.path.join(d, f), settings.MEDIA_ROOT)
+                      for d, _, files in os.walk(settings.MEDIA_ROOT) for f in files)
+
+    def test_dry_run_writes_nothing(self):
+        out = self.run_import(dry_run=True)
+        self.assertIn('+ 200', out)
+        self.assertFalse(Athlete.objects.filter(bib__in=['200', '201']).exists())
+        self.assertFalse(ImportChecksum.objects.exists() or MediaBlob.objects.exists())
+        self.assertEqual(self.media_files(), [])
+
+    def test_photos_are_stored_like_uploads(self):
+        jobs = []
+        with mock.patch.object(images._executor, 'submit', lambda fn, *args: jobs.append((fn, args))):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.run_import()
+        names = set(Athlete.objects.filter(bib__in=['200', '201']).values_list('photo', flat=True))
+        self.assertEqual(len(names), 1)   # same bytes, one blob
+        [name] = names
+        self.assertTrue(name.startswith('cas/'))
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 2)
+        for fn, args in jobs:
+            fn(*args)
+        self.assertIsNotNone(images.manifest(name))
+
+        files = self.media_files()
+        out = self.run_import()
+        self.assertIn('Athletes: unchanged, skipped', out)
+        self.assertEqual(self.media_files(), files)
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 2)
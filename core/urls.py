@@ -6,11 +6,17 @@ urlpatterns = [
     path('', views.landing, name='landing'),
     path('horario', views.horario, name='horario'),
     path('leaderboard', views.leaderboard, name='leaderboard'),
+    path('leaderboard/rows', views.leaderboard_rows, name='leaderboard_rows'),
+    path('leaderboard/stream', views.leaderboard_stream, name='leaderboard_stream'),
+    path('api/standings', views.api_standings, name='api_standings'),
+    path('api/schedule', views.api_schedule, name='api_schedule'),
     path('eventos', views.eventos, name='eventos'),
     path('atletas', views.athletes, name='athletes'),
     path('sponsors', views.sponsors, name='sponsors'),
     path('info-lugar', views.venue_info, name='venue_info'),
     path('staff/scores', views.staff_scores, name='staff_scores'),
+    path('staff/scores/batch', views.staff_scores_batch, name='staff_scores_batch'),
+    path('staff/moderacion', views.staff_moderation, name='staff_moderation'),
     path('staff/schedule', views.staff_schedule, name='staff_schedule'),
     path('me', views.my_day, name='my_day'),
 ]
@@ -1,91 +1,101 @@
-from typing import List, Dict, Tuple
-from .models import Score, EventPart, Division, Athlete
+import re
+from functools import lru_cache
+from html import unescape
+from typing import Optional, Tuple
+from django.utils.html import escape
+
+try:
+    import markdown
+    from markdown.extensions import Extension
+    from markdown.treeprocessors import Treeprocessor
+except ImportError:  # optional: descriptions fall back to escaped text
+    markdown = None
+
+# tiebreak not recorded → sorts after every recorded tiebreak
+NO_TIEBREAK = float('inf')
 
 def standard_competition_points(place: int) -> int:
     # 1st=100, 2nd=96, 3rd=92, ... subtract 4 per place, not below 0
     pts = 100 - (place - 1) * 4
     return max(0, pts)
 
-def rank_part_for_division(part: EventPart, division: Division) -> List[Tuple[int, dict]]:
+def score_rank_key(scoring: str, s) -> Optional[Tuple[int, float, float]]:
     """
-    Returns list of (athlete_id, metrics dict, place) sorted by rank for this part within a division.
-    metrics dict includes the values used for ranking (for display/debug).
+    Sort key for a Score under the given EventPart.scoring (lower is better), or None
+    when the score has nothing meaningful to rank yet:
+      - time_then_reps: finished+time → (0, time+penalty), else reps → (1, -(reps-penalty))
+      - reps: (0, -(reps-penalty))
+      - weight: (0, -weight)
+    The last element is tiebreak_seconds (ASC, missing last).
     """
-    # all athletes in this division with a score for this part
-    qs = (Score.objects
-          .filter(part=part, athlete__division=division)
-          .select_related('athlete'))
-
-    def sort_key(s: Score):
-        if part.scoring == 'time_then_reps':
-            # Finished first, sort by (time+penalty) ASC; else by (reps - penalty) DESC; tiebreak_seconds ASC
-            finished = 1 if s.finished else 0
-            t = (s.time_seconds or 1e12) + (s.penalty_seconds or 0.0)
-            r = (s.reps or 0) - (s.penalty_reps or 0)
-            tb = s.tiebreak_seconds or 1e12
-            # Finished should come before non-finished → sort by (-finished, time, -reps, tiebreak)
-            return (-finished, t, -r, tb)
-
-        elif part.scoring == 'reps':
-            r = (s.reps or 0) - (s.penalty_reps or 0)
-            return (-r, s.athlete.last_name, s.athlete.first_name)
+    tb = s.tiebreak_seconds if s.tiebreak_seconds is not None else NO_TIEBREAK
+    if scoring == 'time_then_reps':
+        if s.finished and s.time_seconds is not None:
+            return (0, s.time_seconds + (s.penalty_seconds or 0), tb)
+        if s.reps is not None:
+            return (1, -(s.reps - (s.penalty_reps or 0)), tb)
+        return None
+    if scoring == 'reps':
+        if s.reps is None:
+            return None
+        return (0, -(s.reps - (s.penalty_reps or 0)), tb)
+    if scoring == 'weight':
+        if s.weight is None:
+            return None
+        return (0, -s.weight, tb)
+    return None
 
-        elif part.scoring == 'weight':
-            w = (s.weight or 0.0)
-            return (-w, s.athlete.last_name, s.athlete.first_name)
+def score_display(scoring: str, s) -> str:
+    """Pretty score cell: m:ss for finished times, 'N reps', or the weight."""
+    if scoring == 'time_then_reps':
+        if s.finished and s.time_seconds is not None:
+            total = (s.time_seconds or 0) + (s.penalty_seconds or 0)
+            m = int(total // 60); sec = int(round(total - m*60))
+            return f"{m}:{sec:02d}"
+        return f"{(s.reps or 0) - (s.penalty_reps or 0)} reps"
+    if scoring == 'reps':
+        return f"{(s.reps or 0) - (s.penalty_reps or 0)} reps"
+    # weight
+    return f"{(s.weight or 0):g}"
 
-        return (0,)
+SAFE_URL_SCHEMES = ('http', 'https', 'mailto')   # plus scheme-less (relative) URLs
+# Python-Markdown's 'extra' minus attr_list ({: onclick=…} would set any attribute) and
+# md_in_html (raw HTML is never passed through anyway)
+MARKDOWN_EXTENSIONS = ['abbr', 'def_list', 'fenced_code', 'footnotes', 'tables', 'sane_lists']
 
-    scores = sorted(qs, key=sort_key)
+_SCHEME_RE = re.compile(r'([a-z][a-z0-9+.-]*):', re.I)
+_IGNORED_IN_URL_RE = re.compile(r'[\x00-\x20\x7f]+')   # browsers skip these, even inside "java\tscript:"
 
-    # Assign places with standard competition ranking (1,1,3,…).
-    places = []
-    prev_key = None
-    place = 0
-    i = 0
-    while i < len(scores):
-        s = scores[i]
-        k = sort_key(s)
-        if prev_key is None or k != prev_key:
-            # new place starts here = previous place + number tied previously
-            place = len(places) + 1
-        prev_key = k
+def safe_url(url: str) -> bool:
+    """True for relative URLs and the allowed schemes, judged the way a browser reads the
+    attribute: entities decoded, control characters and whitespace dropped."""
+    scheme = _SCHEME_RE.match(_IGNORED_IN_URL_RE.sub('', unescape(url)))
+    return scheme is None or scheme.group(1).lower() in SAFE_URL_SCHEMES
 
-        metrics = {
-            'finished': s.finished,
-            'time': s.time_seconds,
-            'reps': s.reps,
-            'weight': s.weight,
-            'tiebreak': s.tiebreak_seconds,
-            'pen_sec': s.penalty_seconds,
-            'pen_reps': s.penalty_reps,
-        }
-        places.append((s.athlete_id, metrics, place))
-        i += 1
+if markdown:
+    class _SafeLinks(Treeprocessor):
+        def run(self, root):
+            for el in root.iter():
+                for attr in list(el.attrib):
+                    # event handlers and inline styles never come from Markdown syntax itself
+                    if attr.lower().startswith('on') or attr.lower() == 'style':
+                        del el.attrib[attr]
+                    elif attr in ('href', 'src') and not safe_url(el.get(attr)):
+                        del el.attrib[attr]
 
-    return places
-
-def aggregate_points_for_division(parts: List[EventPart], division: Division) -> Dict[int, dict]:
-    """
-    Returns a mapping: athlete_id → {'points': total_points, 'by_part': {part.id: {'place':p,'points':pts}}}
-    Only counts parts where counts_as_event=True.
-    """
-    table: Dict[int, dict] = {}
-    for part in parts:
-        rows = rank_part_for_division(part, division)
-        # compute points with standard competition ranking (ties share place & points)
-        # need to know how many tied for a given place: we can recompute by grouping by place
-        from collections import defaultdict
-        by_place = defaultdict(list)
-        for aid, metrics, place in rows:
-            by_place[place].append((aid, metrics))
+    class _Sanitize(Extension):
+        """Raw HTML in the source is shown as text, not passed through; unsafe link schemes
+        and event-handler/style attributes dropped."""
+        def extendMarkdown(self, md):
+            md.preprocessors.deregister('html_block')
+            md.inlinePatterns.deregister('html')
+            md.treeprocessors.register(_SafeLinks(md), 'safe_links', 0)
 
-        # award points
-        for place in sorted(by_place.keys()):
-            pts = standard_competition_points(place)
-            for aid, metrics in by_place[place]:
-                entry = table.setdefault(aid, {'points': 0, 'by_part': {}})
-                if part.counts_as_event:
-                    entry['points'] += pts
-                entry['by_part'][part.id] = {'place': place, 'points': pts, 'metrics': metrics}
-    return table
+@lru_cache(maxsize=256)
+def render_markdown(text: str) -> str:
+    """Markdown → HTML safe to output as-is (Event/EventDivisionSpec.description_html)."""
+    if not text:
+        return ''
+    if markdown is None:
+        return str(escape(text)).replace("\n", "<br>")
+    return markdown.markdown(text, extensions=[*MARKDOWN_EXTENSIONS, _Sanitize()])
@@ -1,37 +1,34 @@
+import json
+from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.forms import modelformset_factory
-from .models import Event, Heat, EventPart, LaneAssignment, Athlete, EventDivisionSpec, Division, Score, Announcement, Sponsor, Venue
-from .utils import aggregate_points_for_division
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_POST
+from .models import Heat, EventPart, LaneAssignment, Athlete, Division, Score, Announcement, Sponsor, Venue, Standing
+from .utils import score_display
+from .standings import current_version
+from . import catalog, live, schedule, scoring
+from .caching import cached_page, conditional_page, RESULTS, SCHEDULE, EVENTS, ROSTER, CONTENT
+from django.db.models import Max, Prefetch, Subquery
 from django.urls import reverse
 from urllib.parse import urlencode
 
+@cached_page(SCHEDULE, CONTENT, timeout=30)  # live/upcoming also move with the clock
 def landing(request):
     now = timezone.localtime()
+    heats = Heat.objects.select_related('event', 'division')
 
-    # All ongoing heats (any division) whose end_time > now
-    ongoing = (Heat.objects
-               .filter(start_time__lte=now)
-               .select_related('event','division')
-               .order_by('-start_time'))
-    ongoing = [h for h in ongoing if h.end_time() > now]
-
-    live_group = []
-    upcoming_group = []
-
-    if ongoing:
-        latest_start = ongoing[0].start_time
-        live_group = [h for h in ongoing if h.start_time == latest_start]
-
-    future = list(Heat.objects
-                  .filter(start_time__gt=now)
-                  .select_related('event','division')
-                  .order_by('start_time')[:12])
-    if future:
-        next_start = future[0].start_time
-        upcoming_group = [h for h in future if h.start_time == next_start]
+    # the heats that started last among those still running, and the next start after now:
+    # one bounded query each on the (start_time, end_time) index, however long the schedule
+    running = Heat.objects.filter(start_time__lte=now, end_time__gt=now).order_by('-start_time')
+    live_group = list(heats.filter(start_time=Subquery(running.values('start_time')[:1]), end_time__gt=now))
+    upcoming = Heat.objects.filter(start_time__gt=now).order_by('start_time')
+    upcoming_group = list(heats.filter(start_time=Subquery(upcoming.values('start_time')[:1])))
 
     announcements = Announcement.objects.all()[:5]
     sponsors = Sponsor.objects.all()
@@ -42,112 +39,92 @@ def landing(request):
         'announcements': announcements,
         'sponsors': sponsors
     })
+def _int_param(request, name, default=None):
+    v = request.GET.get(name, '')
+    return int(v) if v.isdigit() else default
+
+def _found(obj):
+    """get_object_or_404 for core.catalog lookups."""
+    if obj is None:
+        raise Http404
+    return obj
+
+def _int_param_post(request, name):
+    v = request.POST.get(name, '').strip()
+    return int(v) if v.lstrip('-').isdigit() else None
+
+def _horario_changed(request):
+    return (Heat.objects.filter(event__number=_int_param(request, 'event', 1))
+            .aggregate(m=Max('updated_at'))['m'])
+
+@conditional_page(SCHEDULE, EVENTS, params=('event',), last_modified=_horario_changed)
+@cached_page(SCHEDULE, EVENTS, params=('event',))
 def horario(request):
-    event_num = int(request.GET.get('event', 1))
-    event = get_object_or_404(Event, number=event_num)
+    event = _found(catalog.get().event(_int_param(request, 'event', 1)))
     heats = Heat.objects.filter(event=event).select_related('division').order_by('division__sort_order','start_time')
     return render(request, 'public/horario.html', {'event': event, 'heats': heats})
 
-POINTS_TABLE = [100,96,92,88,84,80,76,72,68,64,60,56,52,48,44,40,36,32,28,24,20,16,12,8,4]
-
-def _points_for_place(place: int) -> int:
-    idx = max(0, place - 1)
-    return POINTS_TABLE[idx] if idx < len(POINTS_TABLE) else max(0, 100 - 4*idx)
-
-def _rank_part(part, division):
+LEADERBOARD_PARAMS = ('sexo', 'cat', 'scope', 'event', 'part')
+
+def _leaderboard_changed(request):
+    qs = Score.objects.filter(athlete__division__sex=request.GET.get('sexo', 'F'),
+                              athlete__division__category=request.GET.get('cat', 'sx'))
+    event_num = _int_param(request, 'event')
+    if request.GET.get('scope') == 'part' and event_num is not None:
+        qs = qs.filter(part__event__number=event_num)
+    return qs.aggregate(m=Max('updated_at'))['m']
+
+def _leaderboard_part(request, ref):
+    """(event, part) picked by scope=part&event=N&part=X, or (None, None) for overall."""
+    event_num = _int_param(request, 'event')
+    if request.GET.get('scope') != 'part' or event_num is None:
+        return None, None
+    event = _found(ref.event(event_num))
+    parts_for_event = ref.parts_for(event)
+    part = next((p for p in parts_for_event if p.slug == request.GET.get('part', '')), None) or (parts_for_event[0] if parts_for_event else None)
+    return event, part
+
+def _leaderboard_rows(division, part, since=0):
     """
-    Return rows ONLY for athletes who have a meaningful score on this part:
-      - time_then_reps: finished+time OR reps present
-      - reps: reps present
-      - weight: weight present
-    Output rows: (athlete, place, points, display_value)
+    Rows from the Standing table: per-part (athlete, place, points, display) when part is
+    given, else overall (athlete, total, by_part, place). since > 0 keeps only rows changed
+    after that standings version and splits them into (changed, new).
     """
-    athletes = list(Athlete.objects.filter(division=division, is_active=True))
-    scores = {
-        s.athlete_id: s
-        for s in Score.objects.filter(part=part, athlete__in=athletes, status='approved')
-                              .select_related('athlete')
-    }
-
-    def has_valid(s):
-        if not s:
-            return False
-        if part.scoring == 'time_then_reps':
-            return (s.finished and s.time_seconds is not None) or (s.reps is not None)
-        if part.scoring == 'reps':
-            return s.reps is not None
-        # weight
-        return s.weight is not None
-
-    # keep only athletes with a valid score
-    scored = [(a, scores.get(a.id)) for a in athletes if has_valid(scores.get(a.id))]
-    if not scored:
-        return []  # nothing to rank yet
-
-    def key(pair):
-        a, s = pair
-        if part.scoring == 'time_then_reps':
-            if s.finished and s.time_seconds is not None:
-                total = (s.time_seconds or 0) + (s.penalty_seconds or 0)
-                return (0, total, 0)         # smaller time is better
-            reps = (s.reps or 0) - (s.penalty_reps or 0)
-            return (1, -reps, 0)            # more reps is better (bucket behind finishers)
-        if part.scoring == 'reps':
-            reps = (s.reps or 0) - (s.penalty_reps or 0)
-            return (0, -reps, 0)
-        # weight
-        w = s.weight or 0.0
-        return (0, -w, 0)                    # heavier is better
-
-    ordered = sorted(scored, key=key)
-
-    rows = []
-    place = 0
-    last_key = None
-    tie_count = 0
-    for a, s in ordered:
-        k = key((a, s))
-        if last_key is None or k != last_key:
-            place = place + 1 + tie_count
-            tie_count = 0
-            last_key = k
-        else:
-            tie_count += 1
-
-        pts = _points_for_place(place) if part.counts_as_event else 0
-
-        # pretty display for the score cell
-        if part.scoring == 'time_then_reps':
-            if s.finished and s.time_seconds is not None:
-                total = (s.time_seconds or 0) + (s.penalty_seconds or 0)
-                m = int(total // 60); sec = int(round(total - m*60))
-                disp = f"{m}:{sec:02d}"
+    qs = Standing.objects.filter(division=division).select_related('athlete')
+    if part:
+        qs = qs.filter(part=part)
+        if since:
+            qs = qs.filter(version__gt=since)
+        standings = [(st, (st.athlete, st.place, st.points, st.display)) for st in qs]
+    else:
+        overall, per_part = [], {}
+        for st in qs:
+            if st.part_id is None:
+                overall.append(st)
             else:
-                disp = f"{(s.reps or 0) - (s.penalty_reps or 0)} reps"
-        elif part.scoring == 'reps':
-            disp = f"{(s.reps or 0) - (s.penalty_reps or 0)} reps"
-        else:
-            disp = f"{(s.weight or 0):g}"
-
-        rows.append((a, place, pts, disp))
-    return rows
-
+                per_part.setdefault(st.athlete_id, {})[st.part_id] = {'place': st.place, 'points': st.points}
+        standings = [(st, (st.athlete, st.points, per_part.get(st.athlete_id, {}), st.place))
+                     for st in overall if st.version > since]
+    if not since:
+        return [row for st, row in standings], []
+    return ([row for st, row in standings if st.created_version <= since],
+            [row for st, row in standings if st.created_version > since])
+
+@conditional_page(RESULTS, EVENTS, ROSTER, params=LEADERBOARD_PARAMS, last_modified=_leaderboard_changed)
+@cached_page(RESULTS, EVENTS, ROSTER, params=LEADERBOARD_PARAMS)
 def leaderboard(request):
     sexo = request.GET.get('sexo', 'F')
     cat = request.GET.get('cat', 'sx')
-    scope = request.GET.get('scope', 'overall')      # 'overall' | 'part'
-    event_num = request.GET.get('event')
-    part_slug = request.GET.get('part', '')
 
-    division = get_object_or_404(Division, sex=sexo, category=cat)
-    all_parts = list(EventPart.objects.select_related('event').order_by('event__number', 'order'))
+    ref = catalog.get()
+    division = _found(ref.division(sexo, cat))
+    all_parts = ref.parts
+    version, _reset = current_version(division)   # read before the rows: a poll re-sends anything newer
 
     # Per-part view (E1 / E2A / E2B / E3)
-    if scope == 'part' and event_num:
-        event = get_object_or_404(Event, number=int(event_num))
-        parts_for_event = [p for p in all_parts if p.event_id == event.id]
-        part = next((p for p in parts_for_event if p.slug == part_slug), None) or (parts_for_event[0] if parts_for_event else None)
-        rows_part = _rank_part(part, division) if part else []
+    event, part = _leaderboard_part(request, ref)
+    if event:
+        rows_part = _leaderboard_rows(division, part)[0] if part else []
         return render(request, 'public/leaderboard.html', {
             'division': division,
             'scope': 'part',
@@ -157,25 +134,13 @@ def leaderboard(request):
             'rows_part': rows_part,
             'rows': [],
             'parts': all_parts,
+            'version': version,
+            'live_stream': settings.LIVE_STREAM,
         })
 
-    # Overall = sum of points across counting parts, but only athletes with >=1 scored part
+    # Overall = materialized totals (core.standings); athletes without points have no row
     counting_parts = [p for p in all_parts if p.counts_as_event]
-
-    # accumulate per-athlete points only from ranked rows
-    athletes = list(Athlete.objects.filter(division=division, is_active=True))
-    per_part = {a.id: {} for a in athletes}
-    for p in counting_parts:
-        for a, place, pts, _disp in _rank_part(p, division):
-            per_part[a.id][p.id] = {'place': place, 'points': pts}
-
-    rows = []
-    for a in athletes:
-        d = per_part.get(a.id, {})
-        total = sum(info['points'] for info in d.values())
-        if total > 0:               # <-- hide athletes with no results yet
-            rows.append((a, total, d))
-    rows.sort(key=lambda t: -t[1])
+    rows = _leaderboard_rows(division, None)[0]
 
     return render(request, 'public/leaderboard.html', {
         'division': division,
@@ -185,7 +150,175 @@ def leaderboard(request):
         'parts': counting_parts,
         'event': None,
         'part': None,
+        'version': version,
+        'live_stream': settings.LIVE_STREAM,
+    })
+
+def leaderboard_rows(request):
+    """
+    htmx fragment for the leaderboard table body of one (division, scope, part).
+    v = standings version the client has: 204 when nothing changed since; otherwise only
+    the changed rows as out-of-band swaps, or the whole body if rows were removed after v.
+    """
+    ref = catalog.get()
+    division = _found(ref.division(request.GET.get('sexo', 'F'), request.GET.get('cat', 'sx')))
+    since = _int_param(request, 'v', 0)
+    version, reset = current_version(division)
+    if since and since >= version:
+        return HttpResponse(status=204)
+
+    full = not since or since < reset
+    all_parts = ref.parts
+    event, part = _leaderboard_part(request, ref)
+    if event and not part:
+        return HttpResponse(status=204)
+    rows, new = _leaderboard_rows(division, part, 0 if full else since)
+    response = render(request, 'public/_leaderboard_rows.html', {
+        'scope': 'part' if part else 'overall',
+        'rows_part': rows if part else [],
+        'rows': [] if part else rows,
+        'new_rows': new,
+        'parts': [p for p in all_parts if p.counts_as_event],
+        'oob': not full,
+        'version': version,
     })
+    if not full:
+        response['HX-Reswap'] = 'none'   # everything in a diff is out-of-band
+    return response
+
+async def leaderboard_stream(request):
+    """
+    Server-Sent Events with compact row diffs (athlete, place, points, score) for one
+    division's overall table, or one part with scope=part&event=N&part=X.
+    Must be served by the ASGI app: each open connection is a coroutine, not a thread.
+    404 unless settings.LIVE_STREAM says it is, so a WSGI worker is never held open.
+    """
+    if not settings.LIVE_STREAM:
+        raise Http404
+    division = await Division.objects.filter(sex=request.GET.get('sexo', 'F'),
+                                             category=request.GET.get('cat', 'sx')).afirst()
+    if division is None:
+        raise Http404
+    part_id = None
+    event_num = _int_param(request, 'event')
+    if request.GET.get('scope') == 'part' and event_num is not None:
+        parts = [p async for p in EventPart.objects.filter(event__number=event_num).order_by('order')]
+        part = next((p for p in parts if p.slug == request.GET.get('part', '')), None) or (parts[0] if parts else None)
+        if part is None:
+            raise Http404
+        part_id = part.id
+
+    response = StreamingHttpResponse(live.stream(live.channel(division.id, part_id)),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'   # nginx: don't buffer the stream
+    return response
+
+# ---- JSON API (venue TV boards, third-party displays) ----
+# Short keys, no whitespace; gzip_page compresses per view (no site-wide GZipMiddleware).
+
+def _json(payload):
+    return JsonResponse(payload, json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+
+def _part_label(part):
+    return f"E{part.event.number}{part.slug}"
+
+API_STANDINGS_PARAMS = LEADERBOARD_PARAMS + ('since', 'top', 'around', 'w')
+
+@gzip_page
+@conditional_page(RESULTS, EVENTS, ROSTER, params=API_STANDINGS_PARAMS, last_modified=_leaderboard_changed, public=True)
+@cached_page(RESULTS, EVENTS, ROSTER, params=API_STANDINGS_PARAMS, timeout=60, public=True)
+def api_standings(request):
+    """
+    Overall (or scope=part&event=N&part=X) standings of one division, read from the
+    Standing table. Rows: a=athlete id, b=bib, n=name, pl=place, pt=points, d=score
+    (parts), p={part_id: [place, points]} (overall).
+    top=N keeps the first N rows, around=<bib>&w=K adds K rows either side of that athlete.
+    since=<v> sends only rows changed after version v plus ids (the window's athlete ids in
+    order; drop the rest), 204 if nothing changed, or everything with full=1 when rows
+    were removed after v.
+    """
+    ref = catalog.get()
+    division = _found(ref.division(request.GET.get('sexo', 'F'), request.GET.get('cat', 'sx')))
+    since = _int_param(request, 'since', 0)
+    version, reset = current_version(division)
+    if since and since >= version:
+        return HttpResponse(status=204)
+
+    all_parts = ref.parts
+    event, part = _leaderboard_part(request, ref)
+    if event and not part:
+        raise Http404
+    qs = Standing.objects.filter(division=division).select_related('athlete')
+    if part:
+        qs = qs.filter(part=part)
+    standings, by_part = [], {}
+    for st in qs:
+        if st.part_id == (part.id if part else None):
+            standings.append(st)
+        else:
+            by_part.setdefault(st.athlete_id, {})[st.part_id] = [st.place, st.points]
+
+    top, around, w = _int_param(request, 'top'), request.GET.get('around', ''), _int_param(request, 'w', 2)
+    if top is not None or around:
+        keep = set(range(top or 0))
+        at = next((i for i, st in enumerate(standings) if st.athlete.bib == around), None)
+        if at is not None:
+            keep.update(range(max(0, at - w), at + w + 1))
+        standings = [st for i, st in enumerate(standings) if i in keep]
+
+    full = not since or since < reset
+    payload = {'v': version, 'full': int(full), 'dv': f"{division.sex}-{division.category}"}
+    if part:
+        payload['part'] = [part.id, _part_label(part)]
+    else:
+        payload['parts'] = [[p.id, _part_label(p)] for p in all_parts if p.counts_as_event]
+    if not full:
+        payload['ids'] = [st.athlete_id for st in standings]
+        standings = [st for st in standings if st.version > since]
+
+    rows = []
+    for st in standings:
+        row = {'a': st.athlete_id, 'b': st.athlete.bib, 'n': st.athlete.name(), 'pl': st.place, 'pt': st.points}
+        if part:
+            row['d'] = st.display
+        else:
+            row['p'] = by_part.get(st.athlete_id, {})
+        rows.append(row)
+    payload['rows'] = rows
+    return _json(payload)
+
+def _schedule_changed(request):
+    qs = Heat.objects.all()
+    if _int_param(request, 'event') is not None:
+        qs = qs.filter(event__number=_int_param(request, 'event'))
+    return qs.aggregate(m=Max('updated_at'))['m']
+
+@gzip_page
+@conditional_page(SCHEDULE, EVENTS, ROSTER, params=('event', 'sexo', 'cat'), last_modified=_schedule_changed, public=True)
+@cached_page(SCHEDULE, EVENTS, ROSTER, params=('event', 'sexo', 'cat'), public=True)
+def api_schedule(request):
+    """
+    Heats with lane assignments, optionally filtered by event number and sexo/cat.
+    e=event number, dv=division, h=heat number, t/end=local start/end, l=[lane, bib, name].
+    """
+    heats = (Heat.objects.select_related('event', 'division')
+             .prefetch_related(Prefetch('lanes', LaneAssignment.objects.select_related('athlete')))
+             .order_by('start_time', 'division__sort_order'))
+    event_num = _int_param(request, 'event')
+    if event_num is not None:
+        heats = heats.filter(event__number=event_num)
+    if request.GET.get('sexo'):
+        heats = heats.filter(division__sex=request.GET['sexo'])
+    if request.GET.get('cat'):
+        heats = heats.filter(division__category=request.GET['cat'])
+
+    return _json({'heats': [
+        {'id': h.id, 'e': h.event.number, 'dv': f"{h.division.sex}-{h.division.category}", 'h': h.number,
+         't': timezone.localtime(h.start_time).isoformat(), 'end': timezone.localtime(h.end_time).isoformat(),
+         'l': [[la.lane, la.athlete.bib, la.athlete.name()] for la in h.lanes.all()]}
+        for h in heats
+    ]})
 
 def event_list(request):
     # Any old link to /eventos/ (list) goes to the new unified page
@@ -197,24 +330,37 @@ def event_detail(request, number):
     q = urlencode({'event': number, 'cat': 'sx', 'sexo': 'F'})
     return redirect(f'{base}?{q}')
 
+EVENTOS_PARAMS = ('event', 'sexo', 'cat', 'part')
+
+def _eventos_changed(request):
+    ref = catalog.get()
+    event = ref.event(_int_param(request, 'event', 1))
+    division = ref.division(request.GET.get('sexo', 'F'), request.GET.get('cat', 'sx'))
+    if event is None or division is None:
+        return None
+    return max((s.updated_at for s in ref.specs_for(event, division)), default=None)
+
+@conditional_page(EVENTS, params=EVENTOS_PARAMS, last_modified=_eventos_changed)
+@cached_page(EVENTS, params=EVENTOS_PARAMS)
 def eventos(request):
-    event_num = int(request.GET.get('event', 1))
+    event_num = _int_param(request, 'event', 1)
     sex = request.GET.get('sexo', 'F')                 # 'F' | 'M'
     cat = request.GET.get('cat', 'sx')                 # 'sx' | 'intermedio' | 'rx'
     part_slug = request.GET.get('part', '')            # "", "A", "B", ...
 
-    events = list(Event.objects.order_by('number'))
-    event = get_object_or_404(Event, number=event_num)
-    division = get_object_or_404(Division, sex=sex, category=cat)
+    ref = catalog.get()
+    events = ref.events
+    event = _found(ref.event(event_num))
+    division = _found(ref.division(sex, cat))
 
-    parts = list(EventPart.objects.filter(event=event).order_by('order'))
+    parts = ref.parts_for(event)
     part = next((p for p in parts if p.slug == part_slug), None) or (parts[0] if parts else None)
 
     spec = None
     cap_seconds = event.cap_seconds
     tiebreak_label = ''
     if part:
-        spec = EventDivisionSpec.objects.filter(part=part, division=division).first()
+        spec = ref.spec(part, division)
         if spec and spec.cap_seconds:
             cap_seconds = spec.cap_seconds
         if spec and spec.tiebreak_label:
@@ -242,9 +388,10 @@ def eventos(request):
     })
 
 EXCLUDE_ROSTER_BIBS = {'SXM10','INTF03','INTM03'}
+@cached_page(ROSTER, params=('sexo', 'cat'))
 def athletes(request):
     sex = request.GET.get('sexo','F'); cat = request.GET.get('cat','sx')
-    div = get_object_or_404(Division, sex=sex, category=cat)
+    div = _found(catalog.get().division(sex, cat))
     roster = Athlete.objects.filter(division=div, is_active=True).exclude(bib__in=EXCLUDE_ROSTER_BIBS).order_by('last_name')
     return render(request, 'public/athletes.html', {'division': div, 'roster': roster})
 
@@ -263,63 +410,131 @@ def staff_scores(request):
     heat_no = request.GET.get('heat')
     part_slug = request.GET.get('part', '')  # "", "A", "B"...
 
-    div = get_object_or_404(Division, sex=sexo, category=cat)
-    event = get_object_or_404(Event, number=event_num)
-    parts = list(EventPart.objects.filter(event=event).order_by('order'))
+    ref = catalog.get()
+    div = _found(ref.division(sexo, cat))
+    event = _found(ref.event(event_num))
+    parts = ref.parts_for(event)
     if not parts:
         return render(request, 'staff/scores.html', {'error': 'Este evento no tiene partes configuradas en /admin.'})
 
     # Default to first part if none specified
     part = next((p for p in parts if p.slug == part_slug), None) or parts[0]
 
-    heats_qs = Heat.objects.filter(event=event, division=div).order_by('number')
-    if not heats_qs.exists():
+    heats = list(Heat.objects.filter(event=event, division=div).order_by('number'))
+    if not heats:
         return render(request, 'staff/scores.html', {
             'event': event, 'division': div, 'parts': parts, 'part': part,
             'heats_available': [], 'formset': None, 'lanes': [],
             'error': 'No hay heats para esta combinación. Crea heats en /admin.'
         })
 
-    heat = get_object_or_404(Heat, event=event, division=div, number=int(heat_no)) if heat_no else heats_qs.first()
-    lanes = LaneAssignment.objects.filter(heat=heat).select_related('athlete').order_by('lane')
-
-    # ensure rows exist for this PART+athlete
-    for la in lanes:
-        Score.objects.get_or_create(part=part, athlete=la.athlete)
-
-    # different fields per scoring type
-    fields = ('notes',)
-    if part.scoring == 'time_then_reps':
-        fields = ('finished','time_seconds','reps','tiebreak_seconds','penalty_seconds','penalty_reps','notes')
-    elif part.scoring == 'reps':
-        fields = ('reps','penalty_reps','notes')
-    elif part.scoring == 'weight':
-        fields = ('weight','notes')
+    heat = heats[0]
+    if heat_no:
+        heat = next((h for h in heats if h.number == int(heat_no)), None)
+        if heat is None:
+            raise Http404
+    lanes = list(LaneAssignment.objects.filter(heat=heat).select_related('athlete').order_by('lane'))
+
+    # one form per athlete; those without a Score yet get an unsaved placeholder that is
+    # only created if the judge fills it in (core.scoring.LaneScoreFormSet)
+    athletes = sorted((la.athlete for la in lanes), key=lambda a: (a.last_name, a.pk))
+    existing = {s.athlete_id: s for s in Score.objects.filter(part=part, athlete__in=athletes)}
+    scores = []
+    for a in athletes:
+        score = existing.get(a.pk) or Score()
+        score.part, score.athlete = part, a
+        scores.append(score)
 
-    ScoreFormSet = modelformset_factory(Score, fields=fields, extra=0, can_delete=False)
-    qs = Score.objects.filter(part=part, athlete__in=[la.athlete for la in lanes]).select_related('athlete').order_by('athlete__last_name')
-
-    if request.method == 'POST':
-        formset = ScoreFormSet(request.POST, queryset=qs)
-        if formset.is_valid():
-            formset.save()
-            return redirect(request.get_full_path())
-    else:
-        formset = ScoreFormSet(queryset=qs)
+    formset = scoring.lane_formset(part)(request.POST if request.method == 'POST' else None, scores=scores)
+    if request.method == 'POST' and formset.is_valid() and formset.save():
+        return redirect(request.get_full_path())
 
     return render(request, 'staff/scores.html', {
         'event': event, 'division': div, 'parts': parts, 'part': part,
         'heat': heat, 'lanes': lanes, 'formset': formset,
-        'heats_available': list(heats_qs.values_list('number', flat=True))
+        'heats_available': [h.number for h in heats]
     })
 
+@staff_member_required
+@require_POST
+def staff_scores_batch(request):
+    """
+    JSON {"scores": [{key, part, bib, <primitives>…}, …]} → {"results": […]} (core.scoring).
+    Safe to resend: records are applied once per key, so judges' devices retry blindly.
+    """
+    try:
+        records = json.loads(request.body)['scores']
+    except (ValueError, KeyError, TypeError):
+        records = None
+    if not isinstance(records, list) or len(records) > scoring.MAX_BATCH:
+        return JsonResponse({'error': f'Se espera {{"scores": [...]}} con hasta {scoring.MAX_BATCH} registros.'}, status=400)
+    return _json({'results': scoring.apply_batch(records)})
+
+@staff_member_required
+def staff_moderation(request):
+    """
+    Pending scores grouped by heat and part; a head judge releases a whole group at once
+    (core.scoring.approve: one UPDATE, one re-rank). Only the versions shown are approved.
+    """
+    if request.method == 'POST':
+        seen = {}
+        for value in request.POST.getlist('score'):
+            pk, _, version = value.partition(':')
+            if pk.isdigit() and version.isdigit():
+                seen[int(pk)] = int(version)
+        approved = scoring.approve(seen)
+        if approved:
+            messages.success(request, f"{len(approved)} score(s) aprobados.")
+        if len(approved) < len(seen):
+            messages.warning(request, f"{len(seen) - len(approved)} score(s) cambiaron o ya no estaban "
+                                      "pendientes; revisalos de nuevo.")
+        return redirect(request.get_full_path())
+
+    pending = list(Score.objects.filter(status='pending')
+                   .select_related('part__event', 'athlete__division')
+                   .order_by('athlete__last_name', 'athlete_id'))
+    lanes = (LaneAssignment.objects
+             .filter(athlete__in={s.athlete_id for s in pending},
+                     heat__event__in={s.part.event_id for s in pending})
+             .select_related('heat'))
+    lane_of = {(la.heat.event_id, la.athlete_id): la for la in lanes}
+
+    groups = {}
+    for s in pending:
+        la = lane_of.get((s.part.event_id, s.athlete_id))
+        group = groups.setdefault((la.heat_id if la else None, s.part_id, s.athlete.division_id), {
+            'heat': la.heat if la else None, 'part': s.part, 'division': s.athlete.division, 'rows': []})
+        group['rows'].append({'score': s, 'lane': la.lane if la else None,
+                              'display': score_display(s.part.scoring, s)})
+    groups = sorted(groups.values(), key=lambda g: (g['heat'] is None, g['heat'] and g['heat'].start_time,
+                                                    g['part'].event.number, g['part'].order, g['division'].sort_order))
+    for g in groups:
+        g['rows'].sort(key=lambda r: (r['lane'] is None, r['lane']))
+    return render(request, 'staff/moderation.html', {'groups': groups, 'pending': len(pending)})
+
 @staff_member_required
 def staff_schedule(request):
-    event_num = int(request.GET.get('event', 1))
-    event = get_object_or_404(Event, number=event_num)
+    event = _found(catalog.get().event(_int_param(request, 'event', 1)))
     HeatFormSet = modelformset_factory(Heat, fields=('start_time',), extra=0)
     qs = Heat.objects.filter(event=event).select_related('division').order_by('division__sort_order','number')
 
+    if request.method == 'POST' and 'shift' in request.POST:
+        # "heat X runs N minutes late": one UPDATE for it and everything after it
+        heat = get_object_or_404(qs, pk=_int_param_post(request, 'heat'))
+        minutes = _int_param_post(request, 'minutes')
+        if not minutes:
+            messages.warning(request, "Indicá los minutos a mover (negativo para adelantar).")
+        else:
+            moved, clashes = schedule.shift_from(heat, minutes, later_events='later_events' in request.POST)
+            messages.success(request, f"{moved} heat(s) movidos {minutes:+d} min desde {heat.division.display_name} H{heat.number}.")
+            for c in clashes:
+                who = ', '.join(f"#{a.bib} {a.name()}" for a in c.athletes)
+                messages.warning(request, f"E{c.moved.event.number} {c.moved.division.display_name} H{c.moved.number} "
+                                          f"se superpone con E{c.other.event.number} {c.other.division.display_name} H{c.other.number}"
+                                          + (f" · carriles {', '.join(map(str, c.lanes))}" if c.lanes else '')
+                                          + (f" · atletas {who}" if who else ''))
+        return redirect(request.get_full_path())
+
     if request.method == 'POST':
         formset = HeatFormSet(request.POST, queryset=qs)
         if formset.is_valid():
@@ -337,6 +552,7 @@ def my_day(request):
     upcoming = None
     my_lanes = []
     my_scores = []
+    my_results = {}
 
     if athlete:
         my_lanes = list(
@@ -356,10 +572,16 @@ def my_day(request):
             .select_related('part', 'part__event')
             .order_by('part__event__number', 'part__order')
         )
+        # place/points per part: the leaderboard's materialized rows (core.standings), no re-rank
+        current_version(athlete.division)   # builds the division if it never was
+        my_results = {part_id: {'place': place, 'points': points} for part_id, place, points in
+                      Standing.objects.filter(athlete=athlete, division=athlete.division, part__isnull=False)
+                      .values_list('part_id', 'place', 'points')}
 
     return render(request, 'athlete/my_day.html', {
         'athlete': athlete,
         'upcoming': upcoming,
         'my_lanes': my_lanes,
         'my_scores': my_scores,
+        'my_results': my_results,
     })
\ No newline at end of file